@@ -1,26 +1,74 @@
 from datetime import datetime, timedelta
+from dataclasses import dataclass
 from typing import Optional
+import os
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models
-from .database import get_db
+from .cache import TTLCache
+from .database import get_async_db
+from .hashing import hashing_pool, HashingPoolBusy, HASH_RETRY_AFTER_SECONDS
 
 # Secret key for JWT (in production, use env var)
 SECRET_KEY = "supersecretkeyformvp"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# --- Authenticated user cache ---
+# Snapshots keyed by user id so authenticated requests skip the users-table lookup.
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Detached, immutable view of a User row that is safe to share between requests"""
+    id: int
+    email: str
+    is_admin: int
+    is_premium: int
+    created_at: Optional[str]
+    premium_expires_at: Optional[str]
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_admin=user.is_admin or 0,
+            is_premium=user.is_premium or 0,
+            created_at=user.created_at,
+            premium_expires_at=user.premium_expires_at.isoformat() if user.premium_expires_at else None,
+        )
+
+def invalidate_user(user_id: int):
+    """Drop a cached user snapshot (call after premium/admin/purchase changes)"""
+    user_cache.invalidate(user_id)
+
+def _hashing_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+    )
+
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await hashing_pool.verify_async(plain_password, hashed_password)
+    except HashingPoolBusy:
+        raise _hashing_busy_exception()
+
+async def get_password_hash(password):
+    try:
+        return await hashing_pool.hash_async(password)
+    except HashingPoolBusy:
+        raise _hashing_busy_exception()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,7 +80,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def create_user_token(user: models.User, expires_delta: Optional[timedelta] = None):
+    """Issue a token carrying the user id and access flags alongside the email subject"""
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "uid": user.id,
+            "premium": bool(user.is_premium),
+            "admin": bool(user.is_admin),
+        },
+        expires_delta=expires_delta,
+    )
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -41,17 +101,32 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
+        user_id: Optional[int] = payload.get("uid")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+
+    # Warm path: no database round trip. The cached row (not the token flags)
+    # is authoritative, so premium/admin changes apply once it is invalidated.
+    if user_id is not None:
+        cached = user_cache.get(user_id)
+        if cached is not None and cached.email == email:
+            return cached
+        result = await db.execute(select(models.User).where(models.User.id == user_id))
+    else:
+        # Tokens issued before "uid" was added
+        result = await db.execute(select(models.User).where(models.User.email == email))
+    user = result.scalars().first()
+
+    if user is None or user.email != email:
         raise credentials_exception
-    return user
 
-async def get_current_admin(current_user: models.User = Depends(get_current_user)):
+    current_user = CurrentUser.from_model(user)
+    user_cache.set(current_user.id, current_user)
+    return current_user
+
+async def get_current_admin(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -1,63 +1,198 @@
 #!/usr/bin/env python3
 """
 Script to create Stripe products and prices for the platform.
-Run this once to set up your Stripe account with the necessary products.
+Safe to re-run: the local catalog (premium plans + one product per course) is
+diffed against a cached snapshot of the Stripe account, only missing products
+and prices are created (with bounded concurrency and idempotency keys), and
+the resulting catalog_key -> price id map is written to STRIPE_PRICE_MAP_PATH
+for the app to load at startup.
+
+Usage:
+    python -m backend.create_stripe_products [--refresh] [--dry-run]
 """
 
-import stripe
+import argparse
+import json
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
-# Your Stripe secret key
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_YOUR_KEY_HERE")
+# Add parent directory to path to allow running this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def create_products():
-    print("Creating Stripe products...")
-    
-    # Create Lifetime Access Product
-    try:
-        lifetime_product = stripe.Product.create(
-            name="Lifetime Premium Access",
-            description="Unlock all content forever with a one-time payment"
-        )
-        print(f"✅ Created product: {lifetime_product.name}")
-        
-        lifetime_price = stripe.Price.create(
-            product=lifetime_product.id,
-            unit_amount=4999,  # $49.99
-            currency="usd",
-        )
-        print(f"✅ Created one-time price: ${lifetime_price.unit_amount/100}")
-        print(f"   Price ID: {lifetime_price.id}")
-        
-    except Exception as e:
-        print(f"❌ Error creating lifetime product: {e}")
-    
-    # Create Monthly Subscription Product
-    try:
-        monthly_product = stripe.Product.create(
-            name="Monthly Premium Subscription",
-            description="Access all content with a monthly subscription"
-        )
-        print(f"✅ Created product: {monthly_product.name}")
-        
-        monthly_price = stripe.Price.create(
-            product=monthly_product.id,
-            unit_amount=999,  # $9.99
-            currency="usd",
-            recurring={"interval": "month"}
+import stripe
+
+# Importing the handler applies the API key, STRIPE_API_BASE and HTTP client settings
+from backend.stripe_handler import COURSE_PRICE_GBP, PRICE_MAP_PATH
+from backend.ingestion.curriculum_config import COURSE_CATALOG, COURSE_ID_MAP
+
+SNAPSHOT_PATH = os.getenv("STRIPE_CATALOG_SNAPSHOT_PATH", "./stripe_catalog_snapshot.json")
+PROVISION_CONCURRENCY = int(os.getenv("STRIPE_PROVISION_CONCURRENCY", "4"))
+
+
+def local_catalog() -> List[Dict]:
+    """Everything the platform sells, keyed by a stable catalog_key"""
+    catalog = [
+        {
+            "catalog_key": "premium_lifetime",
+            "name": "Lifetime Premium Access",
+            "description": "Unlock all content forever with a one-time payment",
+            "unit_amount": 4999,  # $49.99
+            "currency": "usd",
+            "interval": None,
+        },
+        {
+            "catalog_key": "premium_monthly",
+            "name": "Monthly Premium Subscription",
+            "description": "Access all content with a monthly subscription",
+            "unit_amount": 999,  # $9.99
+            "currency": "usd",
+            "interval": "month",
+        },
+    ]
+    for course_key, course_data in COURSE_CATALOG.items():
+        course_id = COURSE_ID_MAP[course_key]
+        catalog.append({
+            "catalog_key": f"course_{course_id}",
+            "name": f"Course: {course_data['title']}",
+            "description": f"Lifetime access to {course_data['title']}",
+            "unit_amount": int(COURSE_PRICE_GBP * 100),
+            "currency": "gbp",
+            "interval": None,
+        })
+    return catalog
+
+
+# --- Snapshot of the Stripe account ---
+def fetch_snapshot() -> Dict:
+    """List products and prices once (paged) and keep only what the diff needs"""
+    products = {}
+    for product in stripe.Product.list(limit=100).auto_paging_iter():
+        catalog_key = (product.get("metadata") or {}).get("catalog_key")
+        if catalog_key:
+            products[catalog_key] = {"id": product.id, "active": product.active}
+
+    prices = []
+    for price in stripe.Price.list(limit=100, active=True).auto_paging_iter():
+        recurring = price.get("recurring")
+        prices.append({
+            "id": price.id,
+            "product": price.product,
+            "unit_amount": price.unit_amount,
+            "currency": price.currency,
+            "interval": recurring.get("interval") if recurring else None,
+        })
+    return {"products": products, "prices": prices}
+
+
+def load_snapshot(refresh: bool) -> Dict:
+    if not refresh and os.path.exists(SNAPSHOT_PATH):
+        with open(SNAPSHOT_PATH) as f:
+            return json.load(f)
+    print("🔄 Fetching Stripe catalog snapshot...")
+    return fetch_snapshot()
+
+
+def _write_json(path: str, data: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def find_price(snapshot: Dict, product_id: str, item: Dict) -> Optional[str]:
+    for price in snapshot["prices"]:
+        if (price["product"] == product_id and price["unit_amount"] == item["unit_amount"]
+                and price["currency"] == item["currency"] and price["interval"] == item["interval"]):
+            return price["id"]
+    return None
+
+
+# --- Provisioning ---
+def provision_item(item: Dict, product_id: Optional[str]) -> Dict:
+    """Create whatever is missing for one catalog item; returns its product and price records"""
+    key = item["catalog_key"]
+    if product_id is None:
+        product = stripe.Product.create(
+            name=item["name"],
+            description=item["description"],
+            metadata={"catalog_key": key},
+            idempotency_key=f"provision-product-{key}",
         )
-        print(f"✅ Created monthly price: ${monthly_price.unit_amount/100}/month")
-        print(f"   Price ID: {monthly_price.id}")
-        
-    except Exception as e:
-        print(f"❌ Error creating monthly product: {e}")
-    
+        product_id = product.id
+        print(f"✅ Created product: {item['name']}")
+
+    price_params = {
+        "product": product_id,
+        "unit_amount": item["unit_amount"],
+        "currency": item["currency"],
+        "lookup_key": key,
+        "transfer_lookup_key": True,  # Moves the key off an older price with a different amount
+    }
+    if item["interval"]:
+        price_params["recurring"] = {"interval": item["interval"]}
+    price = stripe.Price.create(
+        **price_params,
+        idempotency_key=f"provision-price-{key}-{item['unit_amount']}-{item['currency']}-{item['interval']}",
+    )
+    print(f"✅ Created price for {key}: {item['unit_amount']/100:.2f} {item['currency'].upper()}"
+          + (f"/{item['interval']}" if item["interval"] else ""))
+    return {
+        "product": {"id": product_id, "active": True},
+        "price": {"id": price.id, "product": product_id, "unit_amount": item["unit_amount"],
+                  "currency": item["currency"], "interval": item["interval"]},
+    }
+
+
+def create_products(refresh: bool = False, dry_run: bool = False) -> Dict[str, str]:
+    print("Creating Stripe products...")
+    snapshot = load_snapshot(refresh)
+
+    price_map = {}
+    missing = []
+    for item in local_catalog():
+        product = snapshot["products"].get(item["catalog_key"])
+        price_id = find_price(snapshot, product["id"], item) if product else None
+        if price_id:
+            price_map[item["catalog_key"]] = price_id
+        else:
+            missing.append((item, product["id"] if product else None))
+
+    print(f"📦 {len(price_map)} up to date, {len(missing)} to create")
+    if dry_run:
+        for item, product_id in missing:
+            print(f"   would create {'price' if product_id else 'product + price'} for {item['catalog_key']}")
+        return price_map
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=PROVISION_CONCURRENCY) as executor:
+            futures = {executor.submit(provision_item, item, product_id): item for item, product_id in missing}
+            for future, item in futures.items():
+                try:
+                    created = future.result()
+                except Exception as e:
+                    print(f"❌ Error provisioning {item['catalog_key']}: {e}")
+                    continue
+                snapshot["products"][item["catalog_key"]] = created["product"]
+                snapshot["prices"].append(created["price"])
+                price_map[item["catalog_key"]] = created["price"]["id"]
+
+    _write_json(SNAPSHOT_PATH, snapshot)
+    _write_json(PRICE_MAP_PATH, price_map)
+
     print("\n" + "="*60)
-    print("IMPORTANT: Update backend/stripe_handler.py with these Price IDs:")
+    print(f"Price map written to {PRICE_MAP_PATH} (loaded by the API at startup):")
     print("="*60)
-    print(f'PRICE_ONE_TIME = "{lifetime_price.id}"')
-    print(f'PRICE_MONTHLY = "{monthly_price.id}"')
+    for key in sorted(price_map):
+        print(f"{key} = {price_map[key]}")
     print("="*60)
+    return price_map
+
 
 if __name__ == "__main__":
-    create_products()
+    parser = argparse.ArgumentParser(description="Provision Stripe products/prices from the local catalog")
+    parser.add_argument("--refresh", action="store_true", help="Re-fetch the Stripe snapshot instead of using the cached one")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be created")
+    args = parser.parse_args()
+    create_products(refresh=args.refresh, dry_run=args.dry_run)
@@ -0,0 +1,248 @@
+"""
+Precomputed curriculum path layouts.
+The static part of a path (ids, titles, urls, node coordinates) only changes
+when videos change, so it is built once per course and cached under a content
+version. Each request only overlays the per-user node status.
+The course catalog is cached the same way. ETags are derived from a digest
+of the cached rows plus users.path_version (bumped by every writer in its
+own transaction), so every worker computes the same ETag for the same
+content and a conditional GET costs one primary-key read.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .models import Course, User, Video
+
+# Node geometry for the UI (sine wave pattern)
+NODE_SPACING = 160
+PATH_WIDTH = 200
+CENTER_X = 400
+
+# Backstop for video writes made by other processes (e.g. the scraper CLI)
+LAYOUT_TTL_SECONDS = float(os.getenv("LAYOUT_TTL_SECONDS", "300"))
+# One entry per course plus the full path; bounded so arbitrary course ids can't grow it
+LAYOUT_CACHE_MAX_SIZE = int(os.getenv("LAYOUT_CACHE_MAX_SIZE", "256"))
+
+
+class ContentVersion:
+    """Process-wide counter bumped whenever a transaction that touched videos or courses commits"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+
+
+content_version = ContentVersion()
+
+
+class ProgressVersions:
+    """Last users.path_version this process saw for each user"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._observed: Dict[int, int] = {}
+
+    def observe(self, user_id: int, path_version: int) -> bool:
+        """Record the shared path version; True if it moved since this process last saw it"""
+        with self._lock:
+            previous = self._observed.get(user_id)
+            self._observed[user_id] = path_version
+        return previous != path_version
+
+
+progress_versions = ProgressVersions()
+
+
+def path_version_bump(user_ids: Iterable[int]):
+    """UPDATE bumping users.path_version; execute it in the transaction that makes the change"""
+    return (
+        update(User)
+        .where(User.id.in_(list(user_ids)))
+        .values(path_version=User.path_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def read_path_version(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(User.path_version).where(User.id == user_id)) or 0
+
+
+@event.listens_for(Session, "after_flush")
+def _track_video_changes(session, flush_context):
+    if any(isinstance(obj, (Video, Course)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["content_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _bump_content_version(session):
+    # Bump after commit so a concurrent rebuild can't cache pre-commit rows under the new version
+    if session.info.pop("content_changed", False):
+        content_version.bump()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_content_changes(session):
+    session.info.pop("content_changed", None)
+
+
+@dataclass(frozen=True)
+class PathLayout:
+    version: int
+    built_at: float
+    digest: str  # Content digest of the rows, identical in every process
+    nodes: Tuple[dict, ...]  # {"id", "title", "x", "y", "video_url"} in path order
+    course_ids: Tuple[Optional[int], ...]  # Course of each node, aligned with nodes
+
+
+_layouts = TTLCache(maxsize=LAYOUT_CACHE_MAX_SIZE, ttl=LAYOUT_TTL_SECONDS)
+
+
+def _is_fresh(entry) -> bool:
+    return (
+        entry is not None
+        and entry.version == content_version.value
+        and time.monotonic() - entry.built_at < LAYOUT_TTL_SECONDS
+    )
+
+
+def content_digest(rows: Iterable) -> str:
+    return hashlib.sha1(json.dumps(list(rows), default=str).encode()).hexdigest()[:16]
+
+
+def _node_position(index: int) -> Tuple[int, int]:
+    x = CENTER_X + (PATH_WIDTH * (1 if index % 2 == 0 else -1) * 0.5)
+    y = (index + 1) * NODE_SPACING
+    return int(x), y
+
+
+def build_layout(rows: Iterable[Tuple[int, str, str, Optional[int]]], version: int) -> PathLayout:
+    rows = [tuple(row) for row in rows]
+    nodes = []
+    course_ids = []
+    for index, (video_id, title, url, course_id) in enumerate(rows):
+        x, y = _node_position(index)
+        nodes.append({"id": video_id, "title": title, "x": x, "y": y, "video_url": url})
+        course_ids.append(course_id)
+    return PathLayout(version=version, built_at=time.monotonic(), digest=content_digest(rows),
+                      nodes=tuple(nodes), course_ids=tuple(course_ids))
+
+
+async def get_layout(db: AsyncSession, course_id: Optional[int] = None) -> PathLayout:
+    """Static layout for one course, or for every video when course_id is None"""
+    version = content_version.value
+    layout = _layouts.get(course_id)
+    if _is_fresh(layout):
+        return layout
+
+    query = select(Video.id, Video.title, Video.url, Video.course_id)
+    if course_id is not None:
+        query = query.where(Video.course_id == course_id)
+    # order_index is per course, so the full path walks course by course
+    rows = (await db.execute(query.order_by(Video.course_id, Video.order_index, Video.id))).all()
+
+    layout = build_layout(rows, version)
+    # Unknown courses (empty layouts) are not cached
+    if layout.nodes:
+        _layouts.set(course_id, layout)
+    return layout
+
+
+def peek_layout(course_id: Optional[int] = None) -> Optional[PathLayout]:
+    """Cached layout if it is still current, without touching the database"""
+    layout = _layouts.get(course_id)
+    return layout if _is_fresh(layout) else None
+
+
+def overlay_status(layout: PathLayout, completed_video_ids: set, unlocked: bool,
+                   unlocked_courses: FrozenSet[int] = frozenset()) -> List[dict]:
+    """
+    Combine the cached layout with one user's progress.
+    Completed nodes are 'completed'; unlocked users (admin/premium) see everything else
+    as 'active', as do nodes of courses in `unlocked_courses` (owned courses);
+    otherwise only the first incomplete node is 'active' and the rest 'locked'.
+    """
+    result = []
+    first_incomplete_found = False
+    for node, course_id in zip(layout.nodes, layout.course_ids):
+        if node["id"] in completed_video_ids:
+            status = "completed"
+        elif unlocked or course_id in unlocked_courses:
+            status = "active"
+        elif not first_incomplete_found:
+            status = "active"
+            first_incomplete_found = True
+        else:
+            status = "locked"
+        result.append({**node, "status": status})
+    return result
+
+
+# --- Course catalog ---
+@dataclass(frozen=True)
+class Catalog:
+    version: int
+    built_at: float
+    digest: str
+    courses: Tuple[dict, ...]
+
+
+_catalog: Optional[Catalog] = None
+
+
+async def get_catalog(db: AsyncSession) -> Catalog:
+    global _catalog
+    version = content_version.value
+    if _is_fresh(_catalog):
+        return _catalog
+
+    courses = (await db.execute(select(Course).order_by(Course.id))).scalars().all()
+    courses = tuple(
+        {
+            "id": c.id,
+            "title": c.title,
+            "description": c.description,
+            "difficulty": c.difficulty,
+            "video_count": c.video_count or 0,
+        }
+        for c in courses
+    )
+    _catalog = Catalog(version=version, built_at=time.monotonic(), digest=content_digest(courses), courses=courses)
+    return _catalog
+
+
+def peek_catalog() -> Optional[Catalog]:
+    return _catalog if _is_fresh(_catalog) else None
+
+
+# --- Library size ---
+@dataclass(frozen=True)
+class VideoTotal:
+    version: int
+    built_at: float
+    count: int
+
+
+_video_total: Optional[VideoTotal] = None
+
+
+async def get_video_total(db: AsyncSession) -> int:
+    """Total number of videos, cached until ingestion changes the library"""
+    global _video_total
+    version = content_version.value
+    if not _is_fresh(_video_total):
+        count = await db.scalar(select(func.count(Video.id)))
+        _video_total = VideoTotal(version=version, built_at=time.monotonic(), count=count or 0)
+    return _video_total.count
@@ -1,14 +1,151 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+# Railway/Heroku hand out postgres:// URLs, which SQLAlchemy no longer accepts
+if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
+    SQLALCHEMY_DATABASE_URL = "postgresql://" + SQLALCHEMY_DATABASE_URL[len("postgres://"):]
+
+# Pool sizing (per process; size against the number of uvicorn workers)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+IS_SQLITE = make_url(SQLALCHEMY_DATABASE_URL).get_backend_name() == "sqlite"
+
+# Async drivers for the same database (aiosqlite locally, asyncpg on Postgres)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Swap the sync DBAPI driver in a database URL for its asyncio counterpart"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# --- Pool checkout metrics ---
+class PoolMetrics:
+    """Tracks how long callers wait to check a connection out of the pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+class _TimedCheckoutMixin:
+    metrics: PoolMetrics
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+    def _do_get(self):
+        # Includes the connect time when the pool has to open a new connection
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except Exception:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.record(time.perf_counter() - started, timed_out)
 
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    metrics = PoolMetrics()
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# --- Engines ---
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    poolclass=TimedQueuePool,
+    **_pool_options(),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    to_async_url(SQLALCHEMY_DATABASE_URL),
+    poolclass=TimedAsyncQueuePool,
+    **_pool_options(),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer holds the lock; busy_timeout makes
+    # writers from other workers wait instead of failing with "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+def upsert_insert(table, dialect_name: str):
+    """Dialect-specific INSERT that supports on_conflict_do_update/do_nothing"""
+    if dialect_name == "postgresql":
+        return postgresql.insert(table)
+    if dialect_name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not implemented for '{dialect_name}'")
+
+def pool_stats() -> dict:
+    """Pool occupancy and checkout wait times for both engines"""
+    stats = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            **pool.metrics.stats(),
+        }
+    return stats
+
 Base = declarative_base()
 
 def get_db():
@@ -17,3 +154,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
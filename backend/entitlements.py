@@ -0,0 +1,86 @@
+"""
+Per-user entitlements resolved once and cached.
+A user's admin flag, premium status and the set of courses they own are
+folded into one immutable Entitlements value, so the path endpoints decide
+access with a flag check or a frozenset lookup instead of querying
+course_purchases per request.
+
+Entries are invalidated when a purchase is recorded (handle_course_purchase)
+or a subscription lapses (premium sweeper), when the path endpoints see that
+another process moved users.path_version, and otherwise expire after
+ENTITLEMENT_CACHE_TTL_SECONDS.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .models import CoursePurchase, User
+
+ENTITLEMENT_CACHE_MAX_SIZE = int(os.getenv("ENTITLEMENT_CACHE_MAX_SIZE", "10000"))
+ENTITLEMENT_CACHE_TTL_SECONDS = float(os.getenv("ENTITLEMENT_CACHE_TTL_SECONDS", "300"))
+
+entitlement_cache = TTLCache(maxsize=ENTITLEMENT_CACHE_MAX_SIZE, ttl=ENTITLEMENT_CACHE_TTL_SECONDS)
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    """Everything needed to decide course access for one user"""
+    user_id: int
+    is_admin: bool
+    is_premium: bool  # Lapsed subscriptions are switched off by the premium sweeper
+    owned_courses: FrozenSet[int]
+
+    @property
+    def unlocks_all(self) -> bool:
+        """Admins and premium users can open every course"""
+        return self.is_admin or self.is_premium
+
+    def can_access(self, course_id: int) -> bool:
+        return self.unlocks_all or course_id in self.owned_courses
+
+    def etag_part(self, course_id: Optional[int] = None) -> str:
+        """Compact access fingerprint for conditional GETs (one course, or all owned courses)"""
+        unlocked = "1" if self.unlocks_all else "0"
+        if course_id is not None:
+            return unlocked + ("1" if course_id in self.owned_courses else "0")
+        return unlocked + ",".join(map(str, sorted(self.owned_courses)))
+
+
+async def get_entitlements(db: AsyncSession, user) -> Entitlements:
+    """
+    Resolve a CurrentUser's entitlements on a cache miss. Flags come from the
+    users row rather than the auth snapshot, which may predate a change made
+    by another process.
+    """
+    cached = entitlement_cache.get(user.id)
+    if cached is not None:
+        return cached
+
+    rows = (await db.execute(
+        select(User.is_admin, User.is_premium, CoursePurchase.course_id)
+        .outerjoin(CoursePurchase, CoursePurchase.user_id == User.id)
+        .where(User.id == user.id)
+    )).all()
+    entitlements = Entitlements(
+        user_id=user.id,
+        is_admin=bool(rows[0].is_admin) if rows else bool(user.is_admin),
+        is_premium=bool(rows[0].is_premium) if rows else bool(user.is_premium),
+        owned_courses=frozenset(row.course_id for row in rows if row.course_id is not None),
+    )
+    entitlement_cache.set(user.id, entitlements)
+    return entitlements
+
+
+def peek_entitlements(user_id: int) -> Optional[Entitlements]:
+    """Cached entitlements without touching the database"""
+    return entitlement_cache.get(user_id)
+
+
+def invalidate_entitlements(user_id: int):
+    """Drop cached entitlements (call after purchases or premium/admin changes)"""
+    entitlement_cache.invalidate(user_id)
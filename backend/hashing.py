@@ -0,0 +1,134 @@
+"""
+Password hashing off the request threads.
+Argon2 is deliberately CPU-heavy, so hashes run in a dedicated (process) pool
+with a cap on in-flight work. When the cap is reached callers fail fast with
+HashingPoolBusy instead of queueing behind a login burst.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+# Argon2 tuning (passlib defaults: time_cost=2, memory_cost=102400 KiB, parallelism=8)
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "102400"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "8"))
+
+# Pool sizing
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "process")  # "process" or "thread"
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 4)))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+# Module-level so they can be pickled into worker processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool already has `max_pending` jobs in flight"""
+
+
+class HashingPool:
+    """Bounded executor for argon2 hash/verify calls"""
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING, use_processes: bool = HASH_EXECUTOR == "process"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing the app never spawns processes
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hashing")
+            return self._executor
+
+    def _acquire_slot(self):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingPoolBusy()
+
+    def _run(self, fn, *args):
+        self._acquire_slot()
+        try:
+            result = self._get_executor().submit(fn, *args).result()
+            self.completed += 1
+            return result
+        finally:
+            self._slots.release()
+
+    async def _run_async(self, fn, *args):
+        # Awaits the executor future, so no event-loop or threadpool thread waits on argon2
+        self._acquire_slot()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Released when the job itself finishes: a cancelled await can't stop argon2
+        # once it is running, so the slot must stay taken until then
+        future.add_done_callback(self._job_done)
+        return await asyncio.wrap_future(future)
+
+    def _job_done(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self.completed += 1
+        self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_verify, plain_password, hashed_password)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run_async(_hash, password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run_async(_verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": "process" if self.use_processes else "thread",
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+hashing_pool = HashingPool()
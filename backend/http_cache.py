@@ -0,0 +1,34 @@
+"""
+Helpers for ETag / conditional GET handling.
+"""
+
+import hashlib
+from fastapi import Request, Response
+
+PRIVATE_REVALIDATE = "private, no-cache"
+PUBLIC_SHORT = "public, max-age=60"
+
+
+def make_etag(*parts) -> str:
+    """ETag from content-derived parts only, so every worker agrees on it"""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag in candidates
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def cache_headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
@@ -62,3 +62,21 @@ COURSE_ID_MAP = {
     "office_skills": 4,
     "car_basics": 5
 }
+
+# Level topic per course, used as the video's cluster_name
+LEVEL_TOPICS = {
+    (course_key, level_data["level"]): level_data["topic"]
+    for course_key, course_data in COURSE_CATALOG.items()
+    for level_data in course_data["levels"]
+}
+
+
+def difficulty_for_level(level: int):
+    """Map a curriculum level index to a difficulty enum"""
+    from backend.models import DifficultyLevel
+    if level <= 2:
+        return DifficultyLevel.BEGINNER
+    elif level <= 4:
+        return DifficultyLevel.INTERMEDIATE
+    else:
+        return DifficultyLevel.ADVANCED
@@ -0,0 +1,76 @@
+"""
+Precompiled keyword matching for ingestion filters.
+Each keyword set is compiled once into a prefix-factored regex (a trie of
+the keywords, e.g. f(?:ail|unny)), so a text is scanned in one pass
+instead of once per keyword. Most texts contain no keyword at all, so a
+plain scan rejects them first; only texts with a candidate hit pay for
+the whole-word pattern, starting from that hit.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Build an alternation that shares common prefixes, e.g. f(?:ail|unny)"""
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        optional = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Matches whole words/phrases from a fixed keyword set (case-insensitive)"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = frozenset(k.lower().strip() for k in keywords if k.strip())
+        if self.keywords:
+            pattern = _trie_pattern(self.keywords)
+            self._candidates = re.compile(pattern)
+            # Lookarounds rather than \b, so keywords ending in punctuation (e.g. c++) still match
+            self._regex = re.compile(rf"(?<!\w){pattern}(?!\w)")
+        else:
+            self._candidates = self._regex = None
+
+    def search(self, *texts: Optional[str]) -> Optional[str]:
+        """Return the first keyword found as a whole word in any of the texts, or None"""
+        if self._regex is None:
+            return None
+        for text in texts:
+            if not text:
+                continue
+            text = text.lower()
+            candidate = self._candidates.search(text)
+            if candidate is None:
+                continue
+            match = self._regex.search(text, candidate.start())
+            if match:
+                return match.group(0)
+        return None
+
+    def __repr__(self):
+        return f"KeywordMatcher({sorted(self.keywords)!r})"
+
+
+@lru_cache(maxsize=64)
+def _cached_matcher(keywords: frozenset) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+
+def matcher_for(keywords: Iterable[str]) -> KeywordMatcher:
+    """Shared matcher for a keyword set; built once per distinct set"""
+    return _cached_matcher(frozenset(k.lower() for k in keywords))
@@ -0,0 +1,116 @@
+"""
+Persistent cache for yt-dlp extraction results.
+Search results are keyed by query and full video info by video id; payloads
+are stored as zlib-compressed JSON and expire after a TTL. A ledger of
+rejected videos (with the reason from passes_filters) lets later runs skip
+known-bad videos without a network call.
+
+Backed by SQLite in WAL mode with a busy timeout, so concurrent scraper
+threads and processes can share one cache file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+CACHE_PATH = os.getenv("SCRAPER_CACHE_PATH", "./ytdlp_cache.db")
+CACHE_TTL_SECONDS = float(os.getenv("SCRAPER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rejected_videos (
+    video_id TEXT PRIMARY KEY,
+    reason TEXT NOT NULL,
+    rejected_at REAL NOT NULL
+);
+"""
+
+
+class MetadataCache:
+    """Thread- and process-safe on-disk cache of yt-dlp info dicts"""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "rejections_skipped": 0,
+        }
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _is_expired(self, stored_at: float) -> bool:
+        return stored_at + self.ttl < time.time()
+
+    # --- Extraction results ---
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT fetched_at, payload FROM extractions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        fetched_at, payload = row
+        if self._is_expired(fetched_at):
+            self._count("expired")
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(zlib.decompress(payload))
+
+    def put(self, key: str, info: Dict):
+        payload = zlib.compress(json.dumps(info, default=str).encode("utf-8"))
+        self._connection().execute(
+            "INSERT OR REPLACE INTO extractions (key, fetched_at, payload) VALUES (?, ?, ?)",
+            (key, time.time(), payload),
+        )
+
+    # --- Rejected-video ledger ---
+    def rejection(self, video_id: str) -> Optional[str]:
+        """Reason a video was rejected on an earlier run, if that verdict is still fresh"""
+        row = self._connection().execute(
+            "SELECT reason, rejected_at FROM rejected_videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if row is None or self._is_expired(row[1]):
+            return None
+        self._count("rejections_skipped")
+        return row[0]
+
+    def record_rejection(self, video_id: str, reason: str):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO rejected_videos (video_id, reason, rejected_at) VALUES (?, ?, ?)",
+            (video_id, reason, time.time()),
+        )
+
+    def summary(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,162 @@
+"""
+Re-validation job for the existing videos table.
+Streams the table in keyset-paginated chunks (WHERE id > last_id ORDER BY id
+LIMIT n) over plain column tuples, scores each chunk with
+VideoValidator.validate_batch, and writes changed difficulty_level /
+cluster_name values back with one bulk UPDATE per chunk. Progress is saved
+to a JSON checkpoint after every chunk, so an interrupted run resumes where
+it stopped and memory stays bounded by the chunk size.
+
+Usage:
+    python -m backend.ingestion.revalidate [--chunk-size 5000] [--restart] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+# Add parent directory to path to allow importing from backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import select, update
+
+from backend.database import SessionLocal
+from backend.models import Video
+from backend.ingestion.curriculum_config import LEVEL_TOPICS, difficulty_for_level
+from backend.ingestion.validator import RejectReason, VideoValidator
+
+CHECKPOINT_PATH = os.getenv("REVALIDATE_CHECKPOINT_PATH", "./revalidate_checkpoint.json")
+DEFAULT_CHUNK_SIZE = int(os.getenv("REVALIDATE_CHUNK_SIZE", "5000"))
+
+_COLUMNS = (
+    Video.id,
+    Video.title,
+    Video.description,
+    Video.duration_seconds,
+    Video.view_count,
+    Video.like_count,
+    Video.resolution_height,
+    Video.course_category,
+    Video.level_index,
+    Video.difficulty_level,
+    Video.cluster_name,
+)
+
+
+def load_checkpoint(path: str) -> Dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_id": 0, "processed": 0, "updated": 0, "reasons": {}}
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    # Write then rename so a crash never leaves a truncated checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def score_chunk(validator: VideoValidator, rows: List) -> tuple[List[Dict], Dict[str, int]]:
+    """Return (bulk update params for changed rows, reason counts) for one chunk"""
+    result = validator.validate_batch(
+        resolution_height=[row.resolution_height or 0 for row in rows],
+        duration_seconds=[row.duration_seconds or 0 for row in rows],
+        view_count=[row.view_count or 0 for row in rows],
+        like_count=[row.like_count or 0 for row in rows],
+        titles=[row.title or "" for row in rows],
+        descriptions=[row.description or "" for row in rows],
+    )
+
+    changes = []
+    for i, row in enumerate(rows):
+        # Curriculum videos take difficulty from their level; others from the validator
+        if row.level_index is not None:
+            difficulty = difficulty_for_level(row.level_index)
+        else:
+            difficulty = result.difficulty(i) or row.difficulty_level
+        cluster_name = LEVEL_TOPICS.get((row.course_category, row.level_index), row.cluster_name)
+
+        if difficulty != row.difficulty_level or cluster_name != row.cluster_name:
+            changes.append({"id": row.id, "difficulty_level": difficulty, "cluster_name": cluster_name})
+
+    return changes, result.reason_counts()
+
+
+def revalidate(chunk_size: int = DEFAULT_CHUNK_SIZE, checkpoint_path: str = CHECKPOINT_PATH,
+               restart: bool = False, dry_run: bool = False) -> Dict:
+    print("\n" + "="*60)
+    print("🔁 VIDEO RE-VALIDATION")
+    print("="*60)
+
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint["last_id"]:
+        print(f"▶️  Resuming after video id {checkpoint['last_id']} ({checkpoint['processed']} rows already done)")
+
+    validator = VideoValidator()
+    db = SessionLocal()
+    started = time.perf_counter()
+    processed_this_run = 0
+
+    try:
+        while True:
+            rows = db.execute(
+                select(*_COLUMNS)
+                .where(Video.id > checkpoint["last_id"])
+                .order_by(Video.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+
+            changes, reason_counts = score_chunk(validator, rows)
+            if changes and not dry_run:
+                db.execute(update(Video), changes)
+            db.commit()
+
+            checkpoint["last_id"] = rows[-1].id
+            checkpoint["processed"] += len(rows)
+            checkpoint["updated"] += len(changes)
+            for reason, count in reason_counts.items():
+                checkpoint["reasons"][reason] = checkpoint["reasons"].get(reason, 0) + count
+            if not dry_run:
+                save_checkpoint(checkpoint_path, checkpoint)
+
+            processed_this_run += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"   ✅ {checkpoint['processed']} rows (last id {checkpoint['last_id']}), "
+                  f"{len(changes)} updated in chunk, {processed_this_run / elapsed:,.0f} rows/sec")
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    print("\n" + "="*60)
+    print("📊 RE-VALIDATION SUMMARY" + (" (dry run)" if dry_run else ""))
+    print("="*60)
+    print(f"Rows processed: {checkpoint['processed']} ({processed_this_run} this run)")
+    print(f"Rows updated: {checkpoint['updated']}")
+    for reason in RejectReason:
+        print(f"{reason.name}: {checkpoint['reasons'].get(reason.name, 0)}")
+    print(f"Throughput: {processed_this_run / elapsed if elapsed else 0:,.0f} rows/sec")
+    print("="*60)
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score existing videos with the current VideoValidator rules")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Score and report without writing")
+    args = parser.parse_args()
+    revalidate(args.chunk_size, args.checkpoint, args.restart, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,62 @@
 """
 Robust YouTube Content Scraper for Life Skills Platform
 Uses yt-dlp to search and filter educational videos
+
+Searches and detail fetches run concurrently on a bounded worker pool with a
+per-host rate limit; filtering and DB writes consume results as they arrive.
 """
 
 import yt_dlp
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import sys
 import os
+import threading
+import time
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.database import SessionLocal
-from backend.models import Video, Course
-from backend.ingestion.curriculum_config import COURSE_CATALOG, COURSE_ID_MAP
+from backend.ingestion.curriculum_config import COURSE_CATALOG, COURSE_ID_MAP, difficulty_for_level
+from backend.ingestion.keywords import matcher_for
+from backend.ingestion.metadata_cache import MetadataCache
+from backend.ingestion.writer import VideoWriter
+
+YOUTUBE_HOST = "www.youtube.com"
+
+class HostRateLimiter:
+    """Spaces out requests to each host so at most `rate_per_second` start per second"""
+    
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, host: str):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+class _LevelState:
+    """Per-level pipeline bookkeeping for scrape_course"""
+    
+    def __init__(self, level_data: Dict):
+        self.level_data = level_data
+        self.candidates = deque()  # (rank, entry, video_url) not yet fetched
+        self.in_flight = 0
+        self.accepted = []  # (rank, Video column values)
+        self.searched = False
+    
+    @property
+    def done(self) -> bool:
+        return self.searched and self.in_flight == 0
 
 class LifeSkillsScraper:
     """Scrapes YouTube for life skills educational content"""
@@ -25,15 +67,26 @@ class LifeSkillsScraper:
     MAX_DURATION = 1200  # 20 minutes
     MAX_VIDEO_AGE_YEARS = 4
     BLACKLIST_WORDS = ["prank", "reaction", "funny", "fail", "compilation"]
+    BLACKLIST_MATCHER = matcher_for(BLACKLIST_WORDS)
     RESULTS_PER_QUERY = 10
+    VIDEOS_PER_LEVEL = 3
+    
+    # Concurrency
+    MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "8"))
+    REQUESTS_PER_SECOND = float(os.getenv("SCRAPER_REQUESTS_PER_SECOND", "4"))
     
-    def __init__(self):
+    def __init__(self, cache: Optional[MetadataCache] = None):
         self.db = SessionLocal()
+        self.cache = cache if cache is not None else MetadataCache()
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="scraper")
+        self.rate_limiter = HostRateLimiter(self.REQUESTS_PER_SECOND)
+        self.seen_urls = set()  # Candidates already queued this run (levels can share results)
         self.stats = {
             "searched": 0,
             "filtered": 0,
             "added": 0,
-            "rejected": 0
+            "rejected": 0,
+            "details_avoided": 0
         }
     
     def search_videos(self, query: str, max_results: int = 10) -> List[Dict]:
@@ -45,12 +98,20 @@ class LifeSkillsScraper:
             'playlistend': max_results,
         }
         
+        cache_key = f"search:{max_results}:{query}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached['entries']
+        
         try:
             search_url = f"ytsearch{max_results}:{query}"
+            self.rate_limiter.acquire(YOUTUBE_HOST)
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 result = ydl.extract_info(search_url, download=False)
                 if result and 'entries' in result:
-                    return [entry for entry in result['entries'] if entry]
+                    entries = [entry for entry in result['entries'] if entry]
+                    self.cache.put(cache_key, {'entries': entries})
+                    return entries
         except Exception as e:
             print(f"❌ Search error for '{query}': {e}")
         
@@ -63,23 +124,59 @@ class LifeSkillsScraper:
             'no_warnings': True,
         }
         
+        cache_key = f"video:{self._video_id(video_url)}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
+            self.rate_limiter.acquire(YOUTUBE_HOST)
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=False)
+                info = ydl.sanitize_info(ydl.extract_info(video_url, download=False))
+                if info:
+                    self.cache.put(cache_key, info)
                 return info
         except Exception as e:
             print(f"❌ Error fetching details for {video_url}: {e}")
             return None
     
-    def passes_filters(self, video_info: Dict) -> tuple[bool, str]:
-        """Check if video passes all filters. Returns (passes, reason)"""
-        
-        # Duration check
-        duration = video_info.get('duration', 0)
+    @staticmethod
+    def _video_id(video_url: str) -> str:
+        return video_url.rsplit("v=", 1)[-1]
+    
+    def _check_duration(self, duration) -> tuple[bool, str]:
         if duration < self.MIN_DURATION:
             return False, f"Too short ({duration}s)"
         if duration > self.MAX_DURATION:
             return False, f"Too long ({duration}s)"
+        return True, "OK"
+    
+    def _check_blacklist(self, title: str, description: str) -> tuple[bool, str]:
+        word = self.BLACKLIST_MATCHER.search(title, description)
+        if word:
+            return False, f"Contains blacklisted word: {word}"
+        return True, "OK"
+    
+    def passes_flat_filters(self, entry: Dict) -> tuple[bool, str]:
+        """
+        Cheap first-stage checks on a flat search entry (no network call).
+        Flat entries usually carry title and duration; checks are skipped for missing fields.
+        """
+        duration = entry.get('duration')
+        if duration is not None:
+            passes, reason = self._check_duration(duration)
+            if not passes:
+                return passes, reason
+        
+        return self._check_blacklist(entry.get('title') or '', entry.get('description') or '')
+    
+    def passes_filters(self, video_info: Dict) -> tuple[bool, str]:
+        """Check if video passes all filters. Returns (passes, reason)"""
+        
+        # Duration check
+        passes, reason = self._check_duration(video_info.get('duration', 0))
+        if not passes:
+            return passes, reason
         
         # Upload date check
         upload_date_str = video_info.get('upload_date')
@@ -93,95 +190,146 @@ class LifeSkillsScraper:
                 pass
         
         # Blacklist check
-        title = video_info.get('title', '').lower()
-        description = video_info.get('description', '').lower()
-        
-        for word in self.BLACKLIST_WORDS:
-            if word in title or word in description:
-                return False, f"Contains blacklisted word: {word}"
-        
-        return True, "OK"
+        return self._check_blacklist(video_info.get('title', ''), video_info.get('description', ''))
     
     def scrape_course(self, course_key: str, course_data: Dict):
-        """Scrape all levels for a specific course"""
+        """
+        Scrape all levels for a specific course.
+        All level searches start at once; as each search lands, detail fetches are
+        scheduled only while the level still needs videos (accepted + in flight
+        < VIDEOS_PER_LEVEL). Results are filtered as they complete, and levels are
+        written to the DB in curriculum order once they finish.
+        """
         print(f"\n{'='*60}")
         print(f"📚 Scraping: {course_data['title']}")
         print(f"{'='*60}")
         
         course_id = COURSE_ID_MAP.get(course_key, 1)
+        writer = VideoWriter(self.db, course_id)
+        
+        levels = [_LevelState(level_data) for level_data in course_data['levels']]
+        search_futures = {}
+        detail_futures = {}
+        for state in levels:
+            query = state.level_data['search_query']
+            print(f"🔍 Level {state.level_data['level']}: {state.level_data['topic']} - '{query}'")
+            search_futures[self.executor.submit(self.search_videos, query, self.RESULTS_PER_QUERY)] = state
+        
+        pending = set(search_futures)
+        next_level_to_write = 0
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in search_futures:
+                    state = search_futures.pop(future)
+                    self._queue_candidates(state, writer, future.result())
+                else:
+                    state, entry, video_url = detail_futures.pop(future)
+                    state.in_flight -= 1
+                    self._consume_details(state, course_key, entry, video_url, future.result())
+                pending |= self._schedule_details(state, detail_futures)
+            
+            # Write finished levels in order so ids follow the curriculum
+            while next_level_to_write < len(levels) and levels[next_level_to_write].done:
+                self._write_level(levels[next_level_to_write], writer)
+                next_level_to_write += 1
+        
+        writer.flush()
+        self.stats['added'] += writer.inserted
+    
+    def _queue_candidates(self, state: _LevelState, writer: VideoWriter, search_results: List[Dict]):
+        state.searched = True
+        self.stats['searched'] += len(search_results)
         
-        for level_data in course_data['levels']:
-            level = level_data['level']
-            topic = level_data['topic']
-            query = level_data['search_query']
+        for rank, entry in enumerate(search_results):
+            video_id = entry.get('id')
+            if not video_id:
+                continue
+            
+            video_url = f"https://www.youtube.com/watch?v={video_id}"
+            
+            if video_url in self.seen_urls:
+                continue
+            self.seen_urls.add(video_url)
             
-            print(f"\n🔍 Level {level}: {topic}")
-            print(f"   Query: '{query}'")
+            # Rejected on an earlier run: skip without a network call
+            known_reason = self.cache.rejection(video_id)
+            if known_reason:
+                self.stats['rejected'] += 1
+                self.stats['details_avoided'] += 1
+                print(f"   ❌ Known reject: {known_reason} - {entry.get('title', 'Unknown')[:50]}")
+                continue
             
-            # Search YouTube
-            search_results = self.search_videos(query, self.RESULTS_PER_QUERY)
-            self.stats['searched'] += len(search_results)
+            # Stage 1: cheap checks on the flat search entry
+            passes, reason = self.passes_flat_filters(entry)
+            if not passes:
+                self.cache.record_rejection(video_id, reason)
+                self.stats['filtered'] += 1
+                self.stats['rejected'] += 1
+                self.stats['details_avoided'] += 1
+                print(f"   ❌ Pre-filtered: {reason} - {entry.get('title', 'Unknown')[:50]}")
+                continue
             
-            added_count = 0
-            for entry in search_results:
-                if added_count >= 3:  # Limit to 3 videos per level
-                    break
-                
-                video_id = entry.get('id')
-                if not video_id:
-                    continue
-                
-                video_url = f"https://www.youtube.com/watch?v={video_id}"
-                
-                # Check if already exists
-                existing = self.db.query(Video).filter(Video.url == video_url).first()
-                if existing:
-                    print(f"   ⏭️  Already exists: {entry.get('title', 'Unknown')[:50]}")
-                    continue
-                
-                # Get full details
-                video_info = self.get_video_details(video_url)
-                if not video_info:
-                    continue
-                
-                # Apply filters
-                passes, reason = self.passes_filters(video_info)
-                if not passes:
-                    self.stats['rejected'] += 1
-                    print(f"   ❌ Rejected: {reason} - {video_info.get('title', 'Unknown')[:50]}")
-                    continue
-                
-                # Add to database
-                video = Video(
-                    course_id=course_id,
-                    course_category=course_key,
-                    level_index=level,
-                    url=video_url,
-                    title=video_info.get('title', 'Unknown'),
-                    description=video_info.get('description', '')[:500] if video_info.get('description') else '',
-                    duration_seconds=video_info.get('duration', 0),
-                    view_count=video_info.get('view_count', 0),
-                    like_count=video_info.get('like_count', 0),
-                    resolution_height=video_info.get('height', 0),
-                    difficulty_level=self._map_level_to_difficulty_enum(level)
-                )
-                
-                self.db.add(video)
-                self.stats['added'] += 1
-                added_count += 1
-                print(f"   ✅ Added: {video.title[:60]}")
+            # Check if already exists
+            if writer.exists(video_url):
+                print(f"   ⏭️  Already exists: {entry.get('title', 'Unknown')[:50]}")
+                continue
             
-            self.db.commit()
+            state.candidates.append((rank, entry, video_url))
+    
+    def _schedule_details(self, state: _LevelState, detail_futures: Dict) -> set:
+        """Start detail fetches only while the level can still use more videos"""
+        scheduled = set()
+        while state.candidates and len(state.accepted) + state.in_flight < self.VIDEOS_PER_LEVEL:
+            rank, entry, video_url = state.candidates.popleft()
+            future = self.executor.submit(self.get_video_details, video_url)
+            detail_futures[future] = (state, (rank, entry), video_url)
+            state.in_flight += 1
+            scheduled.add(future)
+        if len(state.accepted) >= self.VIDEOS_PER_LEVEL:
+            # Quota filled: the remaining survivors never need a full extraction
+            self.stats['details_avoided'] += len(state.candidates)
+            state.candidates.clear()
+        return scheduled
+    
+    def _consume_details(self, state: _LevelState, course_key: str, ranked_entry, video_url: str, video_info: Optional[Dict]):
+        rank, entry = ranked_entry
+        if not video_info:
+            return
+        
+        # Apply filters
+        passes, reason = self.passes_filters(video_info)
+        if not passes:
+            self.cache.record_rejection(self._video_id(video_url), reason)
+            self.stats['rejected'] += 1
+            print(f"   ❌ Rejected: {reason} - {video_info.get('title', 'Unknown')[:50]}")
+            return
+        
+        level = state.level_data['level']
+        video = dict(
+            course_category=course_key,
+            level_index=level,
+            url=video_url,
+            title=video_info.get('title', 'Unknown'),
+            description=video_info.get('description', '')[:500] if video_info.get('description') else '',
+            duration_seconds=video_info.get('duration', 0),
+            view_count=video_info.get('view_count', 0),
+            like_count=video_info.get('like_count', 0),
+            resolution_height=video_info.get('height', 0),
+            difficulty_level=self._map_level_to_difficulty_enum(level),
+            cluster_name=state.level_data['topic']
+        )
+        state.accepted.append((rank, video))
+    
+    def _write_level(self, state: _LevelState, writer: VideoWriter):
+        # Keep search-rank order within the level regardless of fetch completion order
+        for rank, video in sorted(state.accepted, key=lambda item: item[0])[:self.VIDEOS_PER_LEVEL]:
+            if writer.add(**video):
+                print(f"   ✅ Queued (level {state.level_data['level']}): {video['title'][:60]}")
     
     def _map_level_to_difficulty_enum(self, level: int):
         """Map level index to difficulty enum"""
-        from backend.models import DifficultyLevel
-        if level <= 2:
-            return DifficultyLevel.BEGINNER
-        elif level <= 4:
-            return DifficultyLevel.INTERMEDIATE
-        else:
-            return DifficultyLevel.ADVANCED
+        return difficulty_for_level(level)
     
     def run(self):
         """Run the full scraping process"""
@@ -198,9 +346,15 @@ class LifeSkillsScraper:
         print("="*60)
         print(f"Videos searched: {self.stats['searched']}")
         print(f"Videos added: {self.stats['added']}")
-        print(f"Videos rejected: {self.stats['rejected']}")
+        print(f"Videos rejected: {self.stats['rejected']} ({self.stats['filtered']} from search metadata)")
+        print(f"Detail fetches avoided: {self.stats['details_avoided']}")
+        cache_stats = self.cache.summary()
+        print(f"Metadata cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate']:.0%}), {cache_stats['expired']} expired, "
+              f"{cache_stats['rejections_skipped']} known rejects skipped")
         print("="*60)
         
+        self.executor.shutdown(wait=True)
         self.db.close()
 
 if __name__ == "__main__":
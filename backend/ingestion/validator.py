@@ -1,8 +1,11 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 from dataclasses import dataclass
+from enum import IntEnum
+import numpy as np
 from backend.models import DifficultyLevel
+from backend.ingestion.keywords import matcher_for
 
-@dataclass
+@dataclass(slots=True)
 class VideoMetadata:
     url: str
     title: str
@@ -14,6 +17,37 @@ class VideoMetadata:
     resolution_height: int  # e.g., 720, 1080
     difficulty: Optional[DifficultyLevel] = None # Added field
 
+class RejectReason(IntEnum):
+    """Reason codes returned by VideoValidator.validate_batch (first failing check wins)"""
+    OK = 0
+    LOW_RESOLUTION = 1
+    INVALID_DURATION = 2
+    LOW_ENGAGEMENT = 3
+    NEGATIVE_KEYWORD = 4
+
+
+@dataclass(slots=True)
+class BatchValidation:
+    """Result of validate_batch; arrays are aligned with the input rows"""
+    accepted: np.ndarray  # bool
+    reasons: np.ndarray  # uint8 RejectReason codes
+    beginner: np.ndarray  # bool, only meaningful where accepted
+
+    def difficulty(self, index: int) -> Optional[DifficultyLevel]:
+        if not self.accepted[index]:
+            return None
+        return DifficultyLevel.BEGINNER if self.beginner[index] else DifficultyLevel.INTERMEDIATE
+
+    def reason_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.reasons, minlength=len(RejectReason))
+        return {reason.name: int(counts[reason]) for reason in RejectReason}
+
+
+def _int_column(values) -> np.ndarray:
+    """int64 column with None (NULL) as 0; goes through float64 so None becomes NaN"""
+    return np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0).astype(np.int64)
+
+
 class VideoValidator:
     """
     Filters scraped video data based on strict quality heuristics for the educational platform.
@@ -33,6 +67,10 @@ class VideoValidator:
 
     BEGINNER_KEYWORDS = {"intro", "beginner", "basics", "101", "start", "guide", "tutorial"}
 
+    # Compiled once per keyword set (whole-word, case-insensitive)
+    NEGATIVE_MATCHER = matcher_for(NEGATIVE_KEYWORDS)
+    BEGINNER_MATCHER = matcher_for(BEGINNER_KEYWORDS)
+
     def validate(self, video: VideoMetadata) -> Optional[VideoMetadata]:
         """
         Runs all checks on the video. 
@@ -50,14 +88,56 @@ class VideoValidator:
             print(f"Rejected {video.url}: Low engagement (Like/View ratio < 0.5%)")
             return None
 
-        if not self._check_relevance(video):
-            print(f"Rejected {video.url}: Contains negative keywords")
+        negative_keyword = self._find_negative_keyword(video)
+        if negative_keyword:
+            print(f"Rejected {video.url}: Contains negative keyword '{negative_keyword}'")
             return None
 
         # If passed all checks, classify and return
         video.difficulty = self._classify_difficulty(video)
         return video
 
+    def validate_batch(
+        self,
+        resolution_height,
+        duration_seconds,
+        view_count,
+        like_count,
+        titles: Optional[Sequence[str]] = None,
+        descriptions: Optional[Sequence[str]] = None,
+        tags: Optional[Sequence[Sequence[str]]] = None,
+    ) -> BatchValidation:
+        """
+        Columnar version of validate() for re-validating many videos at once.
+        Numeric checks run as vectorized masks; keyword checks only run on rows
+        that survive them. Nothing is printed - callers read the reason codes.
+        Missing (None) numeric values count as 0, so those rows are rejected.
+        """
+        height = _int_column(resolution_height)
+        duration = _int_column(duration_seconds)
+        views = _int_column(view_count)
+        likes = _int_column(like_count)
+        size = len(height)
+
+        reasons = np.zeros(size, dtype=np.uint8)
+        # Assign in reverse check order so the first failing check wins
+        ratio = likes / np.maximum(views, 1)
+        reasons[(views == 0) | (ratio < self.MIN_LIKE_TO_VIEW_RATIO)] = RejectReason.LOW_ENGAGEMENT
+        reasons[(duration < self.MIN_DURATION_SECONDS) | (duration > self.MAX_DURATION_SECONDS)] = RejectReason.INVALID_DURATION
+        reasons[height < self.MIN_RESOLUTION_HEIGHT] = RejectReason.LOW_RESOLUTION
+
+        beginner = np.zeros(size, dtype=bool)
+        for i in np.flatnonzero(reasons == RejectReason.OK):
+            title = titles[i] if titles is not None else ""
+            description = descriptions[i] if descriptions is not None else ""
+            video_tags = " ".join(tags[i]) if tags is not None and tags[i] else ""
+            if self.NEGATIVE_MATCHER.search(title, description, video_tags):
+                reasons[i] = RejectReason.NEGATIVE_KEYWORD
+            elif self.BEGINNER_MATCHER.search(title):
+                beginner[i] = True
+
+        return BatchValidation(accepted=reasons == RejectReason.OK, reasons=reasons, beginner=beginner)
+
     def _check_resolution(self, video: VideoMetadata) -> bool:
         """Reject if resolution < 720p."""
         return video.resolution_height >= self.MIN_RESOLUTION_HEIGHT
@@ -77,12 +157,11 @@ class VideoValidator:
         """
         Scan the video title, description, and tags for 'negative keywords'.
         """
-        text_content = (video.title + " " + video.description + " " + " ".join(video.tags)).lower()
-        
-        for keyword in self.NEGATIVE_KEYWORDS:
-            if keyword in text_content:
-                return False
-        return True
+        return self._find_negative_keyword(video) is None
+
+    def _find_negative_keyword(self, video: VideoMetadata) -> Optional[str]:
+        """Return the first negative keyword in the title, description or tags."""
+        return self.NEGATIVE_MATCHER.search(video.title, video.description, " ".join(video.tags))
 
     def _check_duration(self, video: VideoMetadata) -> bool:
         """
@@ -95,10 +174,8 @@ class VideoValidator:
         Heuristic: If title contains ["Intro", "Beginner", "Basics", "101", "Start"], tag as Beginner.
         Default to Intermediate if no keywords found.
         """
-        title_lower = video.title.lower()
-        for keyword in self.BEGINNER_KEYWORDS:
-            if keyword in title_lower:
-                return DifficultyLevel.BEGINNER
+        if self.BEGINNER_MATCHER.search(video.title):
+            return DifficultyLevel.BEGINNER
         
         # TODO: Add logic for Advanced (e.g., "Masterclass", "Advanced", "Expert")
         
@@ -0,0 +1,64 @@
+"""
+Bulk, deduplicated video writes for content ingestion.
+Existing URLs for a course are loaded once into a set, order_index is
+assigned from a single max() query, and accepted videos are inserted in
+batches with one INSERT ... ON CONFLICT (url) DO NOTHING per batch.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend.database import upsert_insert
+from backend.models import Course, Video
+
+
+class VideoWriter:
+    """Buffers accepted videos for one course and writes them in bulk"""
+
+    BATCH_SIZE = 500
+
+    def __init__(self, db: Session, course_id: Optional[int]):
+        self.db = db
+        self.course_id = course_id
+        self.existing_urls = set(db.scalars(select(Video.url).where(Video.course_id == course_id)))
+        max_order_index = db.scalar(select(func.max(Video.order_index)).where(Video.course_id == course_id))
+        self.next_order_index = (max_order_index or 0) + 1
+        self.video_count = len(self.existing_urls)
+        self._pending: List[Dict] = []
+        self.inserted = 0
+        self.skipped = 0
+
+    def exists(self, url: str) -> bool:
+        return url in self.existing_urls
+
+    def add(self, **values) -> bool:
+        """Queue a video (Video column values); returns False for a known duplicate URL"""
+        url = values["url"]
+        if url in self.existing_urls:
+            self.skipped += 1
+            return False
+        self.existing_urls.add(url)
+        self._pending.append({**values, "course_id": self.course_id, "order_index": self.next_order_index})
+        self.next_order_index += 1
+        if len(self._pending) >= self.BATCH_SIZE:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        # URLs are unique across courses; conflicts with other courses are skipped
+        stmt = upsert_insert(Video.__table__, self.db.get_bind().dialect.name)
+        self.db.execute(stmt.on_conflict_do_nothing(index_elements=["url"]), self._pending)
+        self._pending = []
+
+        # Core inserts bypass the Video mapper events, so refresh the denormalized count here
+        video_count = self.db.scalar(select(func.count(Video.id)).where(Video.course_id == self.course_id))
+        self.db.execute(update(Course).where(Course.id == self.course_id).values(video_count=video_count))
+        self.db.commit()
+
+        self.inserted += video_count - self.video_count
+        self.video_count = video_count
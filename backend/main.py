@@ -1,17 +1,26 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, select, func
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
+import json
+import os
 
-from .models import Base, Video, UserProgress, DifficultyLevel, User, Course, CoursePurchase
-from . import auth
-from .database import engine, SessionLocal, get_db
+from .models import Base, Video, UserProgress, UserStats, DifficultyLevel, User, Course, CoursePurchase, refresh_course_video_counts
+from . import auth, curriculum, entitlements, http_cache, outbox, premium, progress
+from .cache import TTLCache
+from .hashing import hashing_pool
+from .database import engine, async_engine, SessionLocal, get_db, get_async_db, pool_stats
+from .migrations import run_migrations
 
 # --- Database Setup (SQLite for MVP) ---
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 # --- Pydantic Models ---
 class VideoResponse(BaseModel):
@@ -25,6 +34,13 @@ class VideoResponse(BaseModel):
 class ProgressRequest(BaseModel):
     video_id: int
 
+class ProgressCompletion(BaseModel):
+    video_id: int
+    completed_at: Optional[datetime] = None # Client-side timestamp (offline completions)
+
+class ProgressBatchRequest(BaseModel):
+    completions: List[ProgressCompletion] = Field(..., max_length=progress.MAX_BATCH_SIZE)
+
 class UserCreate(BaseModel):
     email: str
     password: str
@@ -57,17 +73,18 @@ app.add_middleware(
     allow_credentials=False,  # Must be False when using "*"
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # --- Auth Endpoints ---
 
 @app.post("/auth/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash(user.password)
     new_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -75,176 +92,207 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         is_admin=0 # Default to normal user
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
-    access_token = auth.create_access_token(data={"sub": new_user.email})
+    access_token = auth.create_user_token(new_user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/auth/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+    if not user or not await auth.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_user_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/auth/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(auth.get_current_user)):
+def read_users_me(current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     return UserResponse(id=current_user.id, email=current_user.email, is_admin=bool(current_user.is_admin), is_premium=bool(current_user.is_premium))
 
 # --- Application Endpoints ---
 
 # Course Endpoints
 @app.get("/courses", response_model=List[CourseResponse])
-def get_courses(db: Session = Depends(get_db)):
-    """Get all available courses"""
-    courses = db.query(Course).all()
-    
-    # Update video counts
-    for course in courses:
-        count = db.query(Video).filter(Video.course_id == course.id).count()
-        course.video_count = count
-    
-    db.commit()
-    
-    return [
-        CourseResponse(
-            id=c.id,
-            title=c.title,
-            description=c.description,
-            difficulty=c.difficulty,
-            video_count=c.video_count
-        ) for c in courses
-    ]
+async def get_courses(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get all available courses (read-only; cached until courses or videos change)"""
+    catalog = curriculum.peek_catalog()
+    if catalog is not None:
+        etag = http_cache.make_etag("courses", catalog.digest)
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag, http_cache.PUBLIC_SHORT)
+    
+    catalog = await curriculum.get_catalog(db)
+    etag = http_cache.make_etag("courses", catalog.digest)
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag, http_cache.PUBLIC_SHORT)
+    return JSONResponse(list(catalog.courses), headers=http_cache.cache_headers(etag, http_cache.PUBLIC_SHORT))
+
+def _path_etag(layout: curriculum.PathLayout, course_id: Optional[int], current_user: auth.CurrentUser,
+               path_version: int, user_entitlements: entitlements.Entitlements) -> str:
+    # Only shared state goes in, so every worker derives the same ETag; buffered
+    # (write-behind) completions are folded in until they are flushed
+    buffered = sorted(progress.progress_buffer.completed_video_ids(current_user.id, course_id))
+    return http_cache.make_etag(
+        "path", course_id, layout.digest, current_user.id, path_version,
+        user_entitlements.etag_part(course_id), buffered
+    )
+
+async def _path_version(db: AsyncSession, current_user: auth.CurrentUser) -> int:
+    """
+    users.path_version for conditional GETs. It is bumped by whichever process
+    records progress, purchases or premium changes, so a moved value also drops
+    this process's cached entitlements.
+    """
+    path_version = await curriculum.read_path_version(db, current_user.id)
+    if curriculum.progress_versions.observe(current_user.id, path_version):
+        entitlements.invalidate_entitlements(current_user.id)
+    return path_version
 
 @app.get("/courses/{course_id}/path", response_model=List[VideoResponse])
-def get_course_path(course_id: int, current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def get_course_path(course_id: int, request: Request, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Returns the curriculum for a specific course.
     """
-    # Get all videos for this course
-    videos = db.query(Video).filter(Video.course_id == course_id).order_by(Video.id).all()
+    # Read the version before any other query so a concurrent completion can't be missed
+    path_version = await _path_version(db, current_user)
+    
+    # Repeat views: answer If-None-Match from the version and cached layout/entitlements
+    layout = curriculum.peek_layout(course_id)
+    cached_entitlements = entitlements.peek_entitlements(current_user.id)
+    if layout is not None and cached_entitlements is not None:
+        etag = _path_etag(layout, course_id, current_user, path_version, cached_entitlements)
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag, http_cache.PRIVATE_REVALIDATE)
     
-    if not videos:
+    # Static layout (ids, titles, urls, coordinates) is cached per course
+    layout = await curriculum.get_layout(db, course_id)
+    
+    if not layout.nodes:
         raise HTTPException(status_code=404, detail="Course not found or has no videos")
     
-    # Get user's completed videos for this course
-    completed_progress = db.query(UserProgress).filter(
-        UserProgress.user_id == str(current_user.id),
+    # Get user's completed videos for this course only (served by ix_user_progress_user_course_completed)
+    completed_progress = await db.execute(select(UserProgress.video_id).where(
+        UserProgress.user_id == current_user.id,
+        UserProgress.course_id == course_id,
         UserProgress.is_completed == 1
-    ).all()
-    completed_video_ids = {int(p.video_id) for p in completed_progress}
-    
-    # Build response
-    result = []
-    first_incomplete_found = False
-    
-    for idx, video in enumerate(videos):
-        # Determine status
-        if video.id in completed_video_ids:
-            status = "completed"
-        elif current_user.is_admin or current_user.is_premium:
-            status = "active"
-        elif not first_incomplete_found:
-            status = "active"
-            first_incomplete_found = True
-        else:
-            status = "locked"
-        
-        result.append(VideoResponse(
-            id=video.id,
-            title=video.title,
-            status=status,
-            x=400 + (100 if idx % 2 == 0 else -100),
-            y=(idx + 1) * 160,
-            video_url=video.url
-        ))
+    ))
+    completed_video_ids = set(completed_progress.scalars().all())
+    completed_video_ids |= progress.progress_buffer.completed_video_ids(current_user.id, course_id)
     
-    return result
+    # Admin, active premium or owning this course unlocks the whole path
+    user_entitlements = await entitlements.get_entitlements(db, current_user)
+    unlocked = user_entitlements.can_access(course_id)
+    etag = _path_etag(layout, course_id, current_user, path_version, user_entitlements)
+    # ETags are content-derived, so one issued by another worker can match here too
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag, http_cache.PRIVATE_REVALIDATE)
+    return JSONResponse(
+        curriculum.overlay_status(layout, completed_video_ids, unlocked),
+        headers=http_cache.cache_headers(etag, http_cache.PRIVATE_REVALIDATE)
+    )
 
 @app.get("/path", response_model=List[VideoResponse])
-def get_path(current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def get_path(request: Request, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Returns the full curriculum for the logged-in user.
     """
-    # 1. Fetch all videos ordered by order_index
-    videos = db.query(Video).order_by(Video.order_index).all()
+    path_version = await _path_version(db, current_user)
+    
+    layout = curriculum.peek_layout()
+    cached_entitlements = entitlements.peek_entitlements(current_user.id)
+    if layout is not None and cached_entitlements is not None:
+        etag = _path_etag(layout, None, current_user, path_version, cached_entitlements)
+        if http_cache.etag_matches(request, etag):
+            return http_cache.not_modified(etag, http_cache.PRIVATE_REVALIDATE)
+    
+    # 1. Cached layout of all videos ordered by course and order_index
+    layout = await curriculum.get_layout(db)
     
     # 2. Fetch user progress
-    progress_records = db.query(UserProgress).filter(UserProgress.user_id == str(current_user.id)).all()
-    completed_video_ids = {p.video_id for p in progress_records if p.is_completed}
-
-    response = []
-    first_incomplete_found = False
-
-    for i, video in enumerate(videos):
-        status = "locked"
-        
-        if video.id in completed_video_ids:
-            status = "completed"
-        elif current_user.is_admin or current_user.is_premium:
-            # God Mode: Admins and Premium users see everything as active (unlocked)
-            status = "active"
-        elif not first_incomplete_found:
-            # The first video that isn't completed is the "active" one
-            status = "active"
-            first_incomplete_found = True
-        
-        # Mock positions for the UI (Sine wave pattern)
-        NODE_SPACING = 160
-        PATH_WIDTH = 200
-        CENTER_X = 400
-        y = (i + 1) * NODE_SPACING
-        x = CENTER_X + (PATH_WIDTH * (1 if i % 2 == 0 else -1) * 0.5) 
-        
-        response.append(VideoResponse(
-            id=video.id,
-            title=video.title,
-            status=status,
-            x=int(x),
-            y=y,
-            video_url=video.url
-        ))
-        
-    return response
+    progress_records = await db.execute(select(UserProgress.video_id).where(
+        UserProgress.user_id == current_user.id,
+        UserProgress.is_completed == 1
+    ))
+    completed_video_ids = set(progress_records.scalars().all())
+    completed_video_ids |= progress.progress_buffer.completed_video_ids(current_user.id)
+
+    # God Mode: Admins and Premium users see everything as active (unlocked);
+    # owned courses are unlocked individually
+    user_entitlements = await entitlements.get_entitlements(db, current_user)
+    etag = _path_etag(layout, None, current_user, path_version, user_entitlements)
+    # ETags are content-derived, so one issued by another worker can match here too
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag, http_cache.PRIVATE_REVALIDATE)
+    return JSONResponse(
+        curriculum.overlay_status(layout, completed_video_ids, user_entitlements.unlocks_all, user_entitlements.owned_courses),
+        headers=http_cache.cache_headers(etag, http_cache.PRIVATE_REVALIDATE)
+    )
 
 @app.post("/progress/complete")
-def complete_video(req: ProgressRequest, current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def complete_video(req: ProgressRequest, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Marks a video as completed for the logged-in user.
     """
     # Check if video exists
-    video = db.query(Video).filter(Video.id == req.video_id).first()
+    video = await db.get(Video, req.video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
 
+    completed_at = datetime.utcnow().isoformat()
+    
+    # Write-behind mode: buffer the completion and let the flusher persist it in bulk
+    if progress.progress_buffer.enabled:
+        progress.progress_buffer.add(current_user.id, video.id, video.course_id, completed_at)
+        return {"message": "Progress updated", "video": video}
+
     # Check/Update progress
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == str(current_user.id), 
-        UserProgress.video_id == req.video_id
-    ).first()
+    user_progress = await db.get(UserProgress, (current_user.id, req.video_id))
 
-    if not progress:
-        progress = UserProgress(
-            user_id=str(current_user.id), 
+    if not user_progress:
+        user_progress = UserProgress(
+            user_id=current_user.id, 
             video_id=req.video_id, 
+            course_id=video.course_id,
             is_completed=1, 
-            completed_at=datetime.utcnow().isoformat()
+            completed_at=completed_at
         )
-        db.add(progress)
+        db.add(user_progress)
+        await progress.increment_completed_counts(db, {current_user.id: 1})
     else:
-        progress.is_completed = 1
-        progress.completed_at = datetime.utcnow().isoformat()
+        if not user_progress.is_completed:
+            await progress.increment_completed_counts(db, {current_user.id: 1})
+        user_progress.is_completed = 1
+        user_progress.course_id = video.course_id
+        user_progress.completed_at = completed_at
     
-    db.commit()
+    await db.execute(curriculum.path_version_bump([current_user.id]))
+    await db.commit()
     return {"message": "Progress updated", "video": video}
 
+@app.post("/progress/batch")
+async def complete_videos_batch(req: ProgressBatchRequest, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """
+    Marks many videos as completed in one transaction (offline sync / binge sessions).
+    """
+    now = datetime.utcnow()
+    
+    # Deduplicate, keeping the latest client timestamp per video
+    completions = {}
+    for item in req.completions:
+        completed_at = progress.normalize_timestamp(item.completed_at, now)
+        if completed_at > completions.get(item.video_id, ""):
+            completions[item.video_id] = completed_at
+    
+    summary = await progress.record_completions(db, current_user.id, completions)
+    
+    return {"received": len(req.completions), **summary}
+
 # Admin endpoint to seed courses
 @app.post("/admin/seed-courses")
 def seed_courses(db: Session = Depends(get_db)):
@@ -297,27 +345,86 @@ def seed_courses(db: Session = Depends(get_db)):
 
 # --- Admin Endpoints ---
 
+# Platform totals are served from a short-lived cache instead of COUNT queries per request
+ADMIN_STATS_TTL_SECONDS = float(os.getenv("ADMIN_STATS_TTL_SECONDS", "60"))
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "100"))
+ADMIN_MAX_PAGE_SIZE = int(os.getenv("ADMIN_MAX_PAGE_SIZE", "1000"))
+ADMIN_EXPORT_BATCH_SIZE = 1000
+
+admin_stats_cache = TTLCache(maxsize=1, ttl=ADMIN_STATS_TTL_SECONDS)
+
+def _platform_totals(db: Session) -> dict:
+    totals = admin_stats_cache.get("totals")
+    if totals is None:
+        user_count, video_count = db.execute(select(
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.count(Video.id)).scalar_subquery()
+        )).one()
+        totals = {"total_users": user_count, "total_videos": video_count}
+        admin_stats_cache.set("totals", totals)
+    return totals
+
 @app.get("/admin/dashboard")
-def admin_dashboard(current_user: User = Depends(auth.get_current_admin), db: Session = Depends(get_db)):
+def admin_dashboard(
+    cursor: Optional[int] = Query(None, description="Return users with id greater than this (next_cursor of the previous page)"),
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    current_user: auth.CurrentUser = Depends(auth.get_current_admin),
+    db: Session = Depends(get_db)
+):
     """
     Admin-only endpoint to view platform stats.
+    Users are keyset-paginated on id; pass `next_cursor` back as `cursor` for the next page.
     """
-    user_count = db.query(User).count()
-    video_count = db.query(Video).count()
-    users = db.query(User).all()
+    query = select(User.id, User.email, User.is_admin).order_by(User.id).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(User.id > cursor)
+    users = db.execute(query).all()
+    has_more = len(users) > limit
+    users = users[:limit]
     
     return {
         "message": f"Welcome Admin {current_user.email}",
-        "stats": {
-            "total_users": user_count,
-            "total_videos": video_count
+        "stats": _platform_totals(db),
+        "cache": {
+            "users": auth.user_cache.stats(),
+            "entitlements": entitlements.entitlement_cache.stats(),
+            "checkout_sessions": checkout_cache.stats()
         },
-        "users": [{"id": u.id, "email": u.email, "is_admin": u.is_admin} for u in users]
+        "hashing": hashing_pool.stats(),
+        "database": pool_stats(),
+        "progress_buffer": progress.progress_buffer.stats(),
+        "outbox": {**outbox.queue_stats(db), "worker": outbox.outbox_worker.stats()},
+        "premium_sweeper": premium.premium_sweeper.stats(),
+        "users": [{"id": u.id, "email": u.email, "is_admin": u.is_admin} for u in users],
+        "next_cursor": users[-1].id if has_more else None
     }
 
+@app.get("/admin/users/export")
+def export_users(current_user: auth.CurrentUser = Depends(auth.get_current_admin)):
+    """Stream every user as NDJSON without loading the table into memory"""
+    def rows():
+        # Own session: the generator outlives the request dependencies
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                select(User.id, User.email, User.is_admin, User.is_premium, User.created_at)
+                .order_by(User.id)
+                .execution_options(yield_per=ADMIN_EXPORT_BATCH_SIZE)
+            )
+            for batch in result.partitions():
+                yield "".join(
+                    json.dumps({"id": u.id, "email": u.email, "is_admin": u.is_admin,
+                                "is_premium": u.is_premium, "created_at": u.created_at}) + "\n"
+                    for u in batch
+                )
+        finally:
+            db.close()
+    
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 # Payment Endpoints
 @app.post("/payment/purchase-course/{course_id}")
-def purchase_course(course_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def purchase_course(course_id: int, current_user: auth.CurrentUser = Depends(auth.get_current_user), db: Session = Depends(get_db)):
     """Create checkout session for purchasing a single course at £2"""
     # Check if user already owns the course
     existing_purchase = db.query(CoursePurchase).filter(
@@ -343,13 +450,13 @@ def purchase_course(course_id: int, current_user: User = Depends(get_current_use
         course_id=course_id,
         course_title=course.title,
         success_url=success_url,
-        cancel_url=cancel_url
+        cancel_url=cancel_url,
+        user_id=current_user.id
     )
     
     return {"checkout_url": session_data["url"]}
 
-from fastapi import Request
-from .stripe_handler import StripeHandler
+from .stripe_handler import StripeHandler, checkout_cache
 
 class CheckoutRequest(BaseModel):
     plan: str  # "one_time" or "monthly"
@@ -357,14 +464,15 @@ class CheckoutRequest(BaseModel):
 @app.post("/payment/create-checkout")
 async def create_checkout(
     req: CheckoutRequest,
-    current_user: User = Depends(auth.get_current_user)
+    current_user: auth.CurrentUser = Depends(auth.get_current_user)
 ):
     """Create a Stripe checkout session"""
     # Determine price ID based on plan
     price_id = StripeHandler.PRICE_ONE_TIME if req.plan == "one_time" else StripeHandler.PRICE_MONTHLY
     
-    # Create checkout session
-    checkout_url = StripeHandler.create_checkout_session(
+    # Create (or reuse) the checkout session on a worker thread; the Stripe call blocks
+    checkout_url = await run_in_threadpool(
+        StripeHandler.create_checkout_session,
         user_email=current_user.email,
         user_id=current_user.id,
         price_id=price_id,
@@ -375,8 +483,8 @@ async def create_checkout(
     return {"checkout_url": checkout_url}
 
 @app.post("/payment/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
-    """Handle Stripe webhook events for course purchases"""
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Verify and queue Stripe webhook events; fulfilment runs in the outbox worker"""
     payload = await request.body()
     sig_header = request.headers.get('stripe-signature')
     
@@ -385,22 +493,12 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    # Handle successful course purchase
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        
-        try:
-            # Process course purchase
-            result = StripeHandler.handle_course_purchase(session, db)
-            print(f"✅ Course purchase successful: User {result['user_id']} purchased course {result['course_id']}")
-        except Exception as e:
-            print(f"❌ Error processing course purchase: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
-    
-    return {"status": "success"}
+    # Acknowledge as soon as the raw event is durable; redeliveries are no-ops
+    queued = await outbox.enqueue(db, event['id'], event['type'], payload.decode("utf-8"))
+    return {"status": "queued" if queued else "duplicate"}
 
 @app.get("/payment/status")
-def get_payment_status(current_user: User = Depends(auth.get_current_user)):
+def get_payment_status(current_user: auth.CurrentUser = Depends(auth.get_current_user)):
     """Get user's premium status"""
     return {
         "is_premium": bool(current_user.is_premium),
@@ -410,34 +508,51 @@ def get_payment_status(current_user: User = Depends(auth.get_current_user)):
 # --- Profile Endpoint ---
 
 @app.get("/profile")
-def get_profile(current_user: User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def get_profile(current_user: auth.CurrentUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Get user profile with stats"""
-    # Get total videos
-    total_videos = db.query(Video).count()
+    # Total videos: process-wide cached counter, refreshed when the library changes
+    total_videos = await curriculum.get_video_total(db)
     
-    # Get completed videos count
-    completed_count = db.query(UserProgress).filter(
-        UserProgress.user_id == str(current_user.id),
-        UserProgress.is_completed == 1
-    ).count()
+    # Completed videos count: maintained incrementally in user_stats
+    completed_count = await db.scalar(
+        select(UserStats.completed_count).where(UserStats.user_id == current_user.id)
+    ) or 0
+    
+    # Write-behind mode: include buffered completions that aren't durable yet
+    buffered = {row["video_id"]: row["completed_at"] for row in progress.progress_buffer.buffered_rows(current_user.id)}
+    if buffered:
+        already_completed = await db.execute(select(UserProgress.video_id).where(
+            UserProgress.user_id == current_user.id,
+            UserProgress.is_completed == 1,
+            UserProgress.video_id.in_(buffered.keys())
+        ))
+        completed_count += len(buffered.keys() - set(already_completed.scalars().all()))
     
     # Calculate progress percentage
     progress_percentage = (completed_count / total_videos * 100) if total_videos > 0 else 0
     
-    # Get recently completed videos
-    recent_completions = db.query(UserProgress).filter(
-        UserProgress.user_id == str(current_user.id),
-        UserProgress.is_completed == 1
-    ).order_by(UserProgress.completed_at.desc()).limit(5).all()
+    # Get recently completed videos in one join (served by ix_user_progress_user_completed_at)
+    recent_completions = (await db.execute(
+        select(UserProgress.video_id, Video.title, UserProgress.completed_at)
+        .join(Video, Video.id == UserProgress.video_id)
+        .where(
+            UserProgress.user_id == current_user.id,
+            UserProgress.is_completed == 1
+        )
+        .order_by(UserProgress.completed_at.desc())
+        .limit(5)
+    )).all()
+    recent = {video_id: (title, completed_at) for video_id, title, completed_at in recent_completions}
     
-    recent_videos = []
-    for progress in recent_completions:
-        video = db.query(Video).filter(Video.id == int(progress.video_id)).first()
-        if video:
-            recent_videos.append({
-                "title": video.title,
-                "completed_at": progress.completed_at
-            })
+    if buffered:
+        buffered_titles = await db.execute(select(Video.id, Video.title).where(Video.id.in_(buffered.keys())))
+        for video_id, title in buffered_titles.all():
+            recent[video_id] = (title, buffered[video_id])
+    
+    recent_videos = [
+        {"title": title, "completed_at": completed_at}
+        for title, completed_at in sorted(recent.values(), key=lambda item: item[1] or "", reverse=True)[:5]
+    ]
     
     return {
         "user": {
@@ -463,6 +578,9 @@ def seed_data():
     # Seed Videos if empty (handled by seed_content.py usually, but keeping fallback)
     if db.query(Video).count() == 0:
         pass 
+    
+    # Reconcile denormalized course video counts (covers rows written before the counter existed)
+    refresh_course_video_counts(db)
         
     # Seed Admin User
     admin_email = "admin@example.com"
@@ -471,7 +589,7 @@ def seed_data():
         print("Seeding Admin User...")
         admin_user = User(
             email=admin_email,
-            hashed_password=auth.get_password_hash("admin123"),
+            hashed_password=hashing_pool.hash("admin123"),
             is_admin=1,
             created_at=datetime.utcnow().isoformat()
         )
@@ -479,3 +597,43 @@ def seed_data():
         db.commit()
         
     db.close()
+
+@app.on_event("startup")
+def load_stripe_prices():
+    StripeHandler.load_price_map()
+
+@app.on_event("startup")
+async def start_progress_buffer():
+    progress.progress_buffer.start()
+
+@app.on_event("startup")
+async def start_outbox_worker():
+    if outbox.OUTBOX_WORKER == "inline":
+        outbox.outbox_worker.start()
+
+@app.on_event("startup")
+async def start_premium_sweeper():
+    premium.premium_sweeper.start()
+
+@app.on_event("shutdown")
+async def stop_premium_sweeper():
+    await premium.premium_sweeper.stop()
+
+@app.on_event("shutdown")
+async def drain_progress_buffer():
+    # Must run before the engines are disposed
+    await progress.progress_buffer.stop()
+
+@app.on_event("shutdown")
+async def stop_outbox_worker():
+    await outbox.outbox_worker.stop()
+
+@app.on_event("shutdown")
+def shutdown_hashing_pool():
+    hashing_pool.shutdown()
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    # Pooled aiosqlite connections each own a worker thread; close them so the process can exit
+    await async_engine.dispose()
+    engine.dispose()
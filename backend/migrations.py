@@ -0,0 +1,160 @@
+"""
+Lightweight, idempotent schema migrations.
+`Base.metadata.create_all` only creates missing tables, so changes to
+existing tables (new columns, retyped columns, new indexes) live here.
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, inspect, text, update
+from .models import CoursePurchase, User, UserProgress, Video
+
+
+def _migrate_user_progress(connection):
+    """Retype user_progress.user_id to INTEGER and add the denormalized course_id"""
+    inspector = inspect(connection)
+    if "user_progress" not in inspector.get_table_names():
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("user_progress")}
+    if "course_id" in columns:
+        return
+
+    print("Migrating user_progress (typed user_id, course_id)...")
+
+    # Free up index/constraint names so the new table can reuse them
+    pk_name = inspector.get_pk_constraint("user_progress").get("name")
+    for index in inspector.get_indexes("user_progress"):
+        connection.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    connection.execute(text("ALTER TABLE user_progress RENAME TO user_progress_old"))
+    if pk_name and connection.dialect.name == "postgresql":
+        connection.execute(text(f"ALTER TABLE user_progress_old RENAME CONSTRAINT {pk_name} TO user_progress_old_pkey"))
+
+    UserProgress.__table__.create(bind=connection)
+    connection.execute(text("""
+        INSERT INTO user_progress (user_id, video_id, course_id, is_completed, completed_at)
+        SELECT CAST(p.user_id AS INTEGER), p.video_id, v.course_id, p.is_completed, p.completed_at
+        FROM user_progress_old p
+        JOIN users u ON u.id = CAST(p.user_id AS INTEGER)
+        LEFT JOIN videos v ON v.id = p.video_id
+    """))
+    connection.execute(text("DROP TABLE user_progress_old"))
+
+
+def _migrate_premium_expires_at(connection):
+    """Retype users.premium_expires_at from ISO strings to a naive-UTC timestamp"""
+    inspector = inspect(connection)
+    if "users" not in inspector.get_table_names():
+        return
+
+    if connection.dialect.name == "postgresql":
+        column = next(c for c in inspector.get_columns("users") if c["name"] == "premium_expires_at")
+        if isinstance(column["type"], DateTime):
+            return
+        print("Migrating users.premium_expires_at to TIMESTAMP...")
+        # Offset-less strings are UTC by convention
+        connection.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+        # A failed cast would abort the ALTER, so unreadable values are handled first, as on
+        # SQLite. The regex keeps to ISO 8601 (Postgres also accepts words like 'tomorrow').
+        connection.execute(text("""
+            CREATE FUNCTION pg_temp.try_timestamptz(value text) RETURNS timestamptz AS $$
+            BEGIN
+                RETURN value::timestamptz;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        revoked = connection.execute(text("""
+            UPDATE users SET is_premium = 0, premium_expires_at = '1970-01-01 00:00:00'
+            WHERE premium_expires_at <> ''
+              AND (premium_expires_at !~ '^\\d{4}-\\d{2}-\\d{2}([ T]\\d{2}:\\d{2}(:\\d{2}(\\.\\d+)?)?)?(Z|[+-]\\d{2}(:?\\d{2})?)?$'
+                   OR pg_temp.try_timestamptz(premium_expires_at) IS NULL)
+            RETURNING id
+        """)).scalars().all()
+        for user_id in revoked:
+            print(f"⚠️  Revoking premium for user {user_id} with unparseable premium_expires_at")
+        connection.execute(text("""
+            ALTER TABLE users ALTER COLUMN premium_expires_at TYPE TIMESTAMP
+            USING (NULLIF(premium_expires_at, '')::timestamptz AT TIME ZONE 'UTC')
+        """))
+        return
+
+    # SQLite keeps the declared column type; rewrite anything not already in
+    # the format the DateTime type stores ("T" separator, UTC offsets such as
+    # +01:00 / -05:00 / Z) into naive UTC so it reads and compares correctly
+    rows = connection.execute(text("""
+        SELECT id, premium_expires_at FROM users
+        WHERE premium_expires_at IS NOT NULL
+          AND premium_expires_at NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+          AND premium_expires_at NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9].[0-9][0-9][0-9][0-9][0-9][0-9]'
+    """)).all()
+    users = User.__table__
+    for user_id, value in rows:
+        values = {}
+        try:
+            expires_at = datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+        except ValueError:
+            # NULL means lifetime premium, so an unreadable expiry is treated as lapsed
+            print(f"⚠️  Revoking premium for user {user_id} with unparseable premium_expires_at: {value!r}")
+            expires_at = datetime(1970, 1, 1)
+            values["is_premium"] = 0
+        if expires_at is not None and expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        values["premium_expires_at"] = expires_at
+        connection.execute(update(users).where(users.c.id == user_id).values(**values))
+
+
+def _add_users_path_version(connection):
+    """Add the shared per-user path version used to validate path ETags"""
+    inspector = inspect(connection)
+    if "users" not in inspector.get_table_names():
+        return
+    if any(column["name"] == "path_version" for column in inspector.get_columns("users")):
+        return
+    print("Adding users.path_version...")
+    connection.execute(text("ALTER TABLE users ADD COLUMN path_version INTEGER NOT NULL DEFAULT 0"))
+
+
+def _backfill_user_stats(connection):
+    """Seed user_stats from existing progress the first time the table is used"""
+    if connection.execute(text("SELECT 1 FROM user_stats LIMIT 1")).first() is not None:
+        return
+    connection.execute(text("""
+        INSERT INTO user_stats (user_id, completed_count)
+        SELECT user_id, COUNT(*) FROM user_progress
+        WHERE is_completed = 1
+        GROUP BY user_id
+    """))
+
+
+def _dedupe_course_purchases(connection):
+    """Drop duplicate (user_id, course_id) purchases before the unique index is created"""
+    inspector = inspect(connection)
+    if "course_purchases" not in inspector.get_table_names():
+        return
+    if any(index["name"] == "uq_course_purchases_user_course" for index in inspector.get_indexes("course_purchases")):
+        return
+    result = connection.execute(text("""
+        DELETE FROM course_purchases
+        WHERE id NOT IN (SELECT MIN(id) FROM course_purchases GROUP BY user_id, course_id)
+    """))
+    if result.rowcount:
+        print(f"Removed {result.rowcount} duplicate course purchases")
+
+
+def _create_missing_indexes(connection):
+    """Create indexes declared on models that predate them"""
+    for table in (Video.__table__, UserProgress.__table__, CoursePurchase.__table__, User.__table__):
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+def run_migrations(engine):
+    with engine.begin() as connection:
+        _migrate_user_progress(connection)
+        _dedupe_course_purchases(connection)
+        _migrate_premium_expires_at(connection)
+        _add_users_path_version(connection)
+        _create_missing_indexes(connection)
+        _backfill_user_stats(connection)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Enum as SQLEnum, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Enum as SQLEnum, Text, Float, DateTime, ForeignKey, Index, event, select, update, func
+from sqlalchemy.orm.attributes import get_history
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import enum
@@ -24,6 +25,10 @@ class Course(Base):
 class CoursePurchase(Base):
     """Track individual course purchases"""
     __tablename__ = "course_purchases"
+    __table_args__ = (
+        # One purchase per user and course; webhook retries upsert against this
+        Index("uq_course_purchases_user_course", "user_id", "course_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -32,9 +37,39 @@ class CoursePurchase(Base):
     stripe_payment_id = Column(String)
     amount_paid = Column(Float, default=2.0)  # £2 per course
 
+class StripeEvent(Base):
+    """Ledger of processed Stripe webhook events, keyed by Stripe event id"""
+    __tablename__ = "stripe_events"
+
+    id = Column(String, primary_key=True)  # e.g. "evt_..."
+    type = Column(String, nullable=False)
+    processed_at = Column(String, default=lambda: datetime.utcnow().isoformat())
+
+class OutboxEvent(Base):
+    """Verified webhook events waiting for the background outbox worker"""
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Claim query: WHERE status = 'pending' AND available_at <= now ORDER BY id
+        Index("ix_outbox_events_status_available", "status", "available_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String, unique=True, nullable=False)  # Stripe event id
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # Raw event JSON
+    status = Column(String, default="pending", nullable=False)  # "pending" or "dead"; done rows are deleted
+    attempts = Column(Integer, default=0, nullable=False)
+    available_at = Column(DateTime, nullable=False)  # Next attempt (backoff) or lease expiry
+    created_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+
 # --- Video Model ---
 class Video(Base):
     __tablename__ = 'videos'
+    __table_args__ = (
+        # Curriculum path: WHERE course_id = ? ORDER BY order_index
+        Index("ix_videos_course_order", "course_id", "order_index"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, default=1)  # FK to Course (default to first course)
@@ -56,16 +91,69 @@ class Video(Base):
     def __repr__(self):
         return f"<Video(title='{self.title}', difficulty='{self.difficulty_level}')>"
 
+# --- Denormalized Course.video_count ---
+# Kept in step with Video inserts/deletes so the catalog never has to count rows on read.
+def _adjust_course_video_count(connection, course_id, delta: int):
+    if course_id is None:
+        return
+    connection.execute(
+        update(Course.__table__)
+        .where(Course.__table__.c.id == course_id)
+        .values(video_count=func.coalesce(Course.__table__.c.video_count, 0) + delta)
+    )
+
+@event.listens_for(Video, "after_insert")
+def _video_inserted(mapper, connection, target):
+    _adjust_course_video_count(connection, target.course_id, 1)
+
+@event.listens_for(Video, "after_delete")
+def _video_deleted(mapper, connection, target):
+    _adjust_course_video_count(connection, target.course_id, -1)
+
+@event.listens_for(Video, "after_update")
+def _video_updated(mapper, connection, target):
+    history = get_history(target, "course_id")
+    if not history.has_changes():
+        return
+    for old_course_id in history.deleted:
+        _adjust_course_video_count(connection, old_course_id, -1)
+    for new_course_id in history.added:
+        _adjust_course_video_count(connection, new_course_id, 1)
+
+def refresh_course_video_counts(db):
+    """Recompute every Course.video_count with a single correlated UPDATE (startup reconciliation)"""
+    counts = select(func.count(Video.id)).where(Video.course_id == Course.id).scalar_subquery()
+    db.execute(update(Course).values(video_count=counts))
+    db.commit()
+
 class UserProgress(Base):
     __tablename__ = 'user_progress'
+    __table_args__ = (
+        # Per-course completion lookup for the curriculum path
+        Index("ix_user_progress_user_course_completed", "user_id", "course_id", "is_completed"),
+        # Profile: a user's most recent completions
+        Index("ix_user_progress_user_completed_at", "user_id", "completed_at"),
+    )
 
-    user_id = Column(String, primary_key=True, index=True) # Simple string ID for MVP
-    video_id = Column(Integer, primary_key=True, index=True) # Composite PK (user_id, video_id)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True) # Composite PK (user_id, video_id)
+    video_id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, nullable=True) # Denormalized from Video.course_id
     is_completed = Column(Integer, default=0) # 0 or 1 (Boolean in Postgres)
     completed_at = Column(String, nullable=True) # ISO format string for simplicity
 
+class UserStats(Base):
+    """Per-user aggregates maintained incrementally as progress is recorded"""
+    __tablename__ = 'user_stats'
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    completed_count = Column(Integer, default=0, nullable=False)
+
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Premium sweeper: WHERE is_premium = 1 AND premium_expires_at <= now
+        Index("ix_users_premium_expires", "is_premium", "premium_expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
@@ -76,5 +164,8 @@ class User(Base):
     # Premium/Payment fields
     is_premium = Column(Integer, default=0) # 0=False, 1=True
     stripe_customer_id = Column(String, nullable=True)
-    premium_expires_at = Column(String, nullable=True) # ISO format, None = lifetime
+    premium_expires_at = Column(DateTime, nullable=True) # Naive UTC, None = lifetime
+    # Bumped in the same transaction as any change to what /path shows this user
+    # (progress, purchases, premium), so every worker can validate path ETags
+    path_version = Column(Integer, default=0, server_default="0", nullable=False)
 
@@ -0,0 +1,266 @@
+"""
+Outbox queue for webhook side effects.
+/payment/webhook only verifies the signature, stores the raw event in
+outbox_events and returns 200. OutboxWorker drains the table in batches
+and runs fulfilment (StripeHandler.process_event, which is idempotent via
+the stripe_events ledger) off the request path.
+
+Claiming a batch is one UPDATE ... RETURNING that bumps `attempts` and
+pushes `available_at` out by a lease, so a crashed worker's rows become
+claimable again once the lease expires. Failures are retried with
+exponential backoff; after OUTBOX_MAX_ATTEMPTS a row is dead-lettered
+(status = 'dead') and kept for inspection. Processed rows are deleted.
+
+The worker runs in-process by default (OUTBOX_WORKER=inline). Set
+OUTBOX_WORKER=external on the web process and run `python -m backend.outbox`
+separately to drain it from its own process; in-process caches in the web
+process then fall back to their TTLs instead of being invalidated.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, upsert_insert
+from .models import OutboxEvent
+
+OUTBOX_WORKER = os.getenv("OUTBOX_WORKER", "inline").lower()
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "2"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "600"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+
+
+async def enqueue(db: AsyncSession, event_id: str, event_type: str, payload: str) -> bool:
+    """Persist a verified event; returns False if this event id is already queued"""
+    now = datetime.utcnow()
+    stmt = upsert_insert(OutboxEvent.__table__, db.bind.dialect.name).values(
+        event_id=event_id,
+        type=event_type,
+        payload=payload,
+        status="pending",
+        attempts=0,
+        available_at=now,
+        created_at=now,
+    )
+    result = await db.execute(stmt.on_conflict_do_nothing(index_elements=["event_id"]))
+    await db.commit()
+    outbox_worker.notify()
+    return result.rowcount > 0
+
+
+def queue_stats(db: Session) -> dict:
+    """Queue depth and lag straight from the table (valid whichever process drains it)"""
+    now = datetime.utcnow()
+    pending, oldest = db.execute(
+        select(func.count(OutboxEvent.id), func.min(OutboxEvent.created_at))
+        .where(OutboxEvent.status == "pending")
+    ).one()
+    dead = db.scalar(select(func.count(OutboxEvent.id)).where(OutboxEvent.status == "dead"))
+    return {
+        "pending": pending,
+        "dead": dead,
+        "oldest_pending_age_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+    }
+
+
+class OutboxWorker:
+    """Drains outbox_events in batches with retry, backoff and dead-lettering"""
+
+    def __init__(self, batch_size: int, poll_interval: float, max_attempts: int,
+                 backoff_base: float, backoff_max: float, lease_seconds: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._metrics_lock = threading.Lock()
+        self.started_at: Optional[float] = None
+        self.batches = 0
+        self.processed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.last_batch_per_sec = 0.0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.total_lag_seconds = 0.0
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    def _claim(self, db: Session) -> list:
+        now = datetime.utcnow()
+        candidates = (
+            select(OutboxEvent.id)
+            .where(OutboxEvent.status == "pending", OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)  # Postgres: concurrent workers skip each other's rows
+        )
+        rows = db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(candidates))
+            .values(attempts=OutboxEvent.attempts + 1, available_at=now + timedelta(seconds=self.lease_seconds))
+            .returning(OutboxEvent.id, OutboxEvent.payload, OutboxEvent.attempts, OutboxEvent.created_at)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        return sorted(rows, key=lambda row: row.id)
+
+    def drain_once(self) -> int:
+        """Claim and process one batch; returns the number of rows claimed"""
+        from .stripe_handler import StripeHandler
+
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            rows = self._claim(db)
+            if not rows:
+                return 0
+
+            done_ids = []
+            failures = []
+            lags = []
+            for row in rows:
+                try:
+                    StripeHandler.process_event(json.loads(row.payload))
+                except Exception as e:
+                    failures.append((row, e))
+                    continue
+                done_ids.append(row.id)
+                lags.append((datetime.utcnow() - row.created_at).total_seconds())
+
+            # Bookkeeping is written after the batch: on SQLite an open write
+            # transaction here would block process_event's own session
+            if done_ids:
+                db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(done_ids)))
+            for row, error in failures:
+                self._fail(db, row, error)
+            db.commit()
+        finally:
+            db.close()
+
+        elapsed = time.perf_counter() - started
+        with self._metrics_lock:
+            self.batches += 1
+            self.processed += len(done_ids)
+            self.last_batch_per_sec = len(rows) / elapsed if elapsed else 0.0
+            if lags:
+                self.last_lag_seconds = lags[-1]
+                self.max_lag_seconds = max(self.max_lag_seconds, max(lags))
+                self.total_lag_seconds += sum(lags)
+        return len(rows)
+
+    def _fail(self, db: Session, row, error: Exception):
+        values = {"last_error": str(error)[:2000]}
+        if row.attempts >= self.max_attempts:
+            values["status"] = "dead"
+            print(f"☠️  Outbox event {row.id} dead-lettered after {row.attempts} attempts: {error}")
+            with self._metrics_lock:
+                self.dead_lettered += 1
+        else:
+            delay = self.backoff(row.attempts)
+            values["available_at"] = datetime.utcnow() + timedelta(seconds=delay)
+            print(f"⚠️  Outbox event {row.id} failed (attempt {row.attempts}), retrying in {delay:.0f}s: {error}")
+            with self._metrics_lock:
+                self.retried += 1
+        db.execute(update(OutboxEvent).where(OutboxEvent.id == row.id).values(**values))
+
+    def notify(self):
+        """Wake the in-process worker early (called after enqueue)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                claimed = await run_in_threadpool(self.drain_once)
+            except Exception as e:
+                print(f"❌ Outbox batch failed: {e}")
+                claimed = 0
+            if claimed < self.batch_size and not self._stopping:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self.started_at = time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Let the current batch finish, then stop"""
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    def run_forever(self):
+        """Standalone worker loop (python -m backend.outbox)"""
+        self.started_at = time.monotonic()
+        print("📮 Outbox worker started")
+        while True:
+            try:
+                claimed = self.drain_once()
+            except Exception as e:
+                print(f"❌ Outbox batch failed: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                time.sleep(self.poll_interval)
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+            return {
+                "mode": OUTBOX_WORKER,
+                "running": self._task is not None,
+                "batches": self.batches,
+                "processed": self.processed,
+                "retried": self.retried,
+                "dead_lettered": self.dead_lettered,
+                "throughput_per_sec": round(self.processed / uptime, 3) if uptime else 0.0,
+                "last_batch_per_sec": round(self.last_batch_per_sec, 3),
+                "last_lag_seconds": round(self.last_lag_seconds, 3),
+                "avg_lag_seconds": round(self.total_lag_seconds / self.processed, 3) if self.processed else 0.0,
+                "max_lag_seconds": round(self.max_lag_seconds, 3),
+            }
+
+
+outbox_worker = OutboxWorker(
+    batch_size=OUTBOX_BATCH_SIZE,
+    poll_interval=OUTBOX_POLL_INTERVAL_SECONDS,
+    max_attempts=OUTBOX_MAX_ATTEMPTS,
+    backoff_base=OUTBOX_BACKOFF_BASE_SECONDS,
+    backoff_max=OUTBOX_BACKOFF_MAX_SECONDS,
+    lease_seconds=OUTBOX_LEASE_SECONDS,
+)
+
+
+if __name__ == "__main__":
+    from .database import engine
+    from .migrations import run_migrations
+    from .models import Base
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    outbox_worker.run_forever()
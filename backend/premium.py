@@ -0,0 +1,121 @@
+"""
+Premium-expiry sweeper.
+Instead of comparing premium_expires_at on every request, a background task
+periodically switches lapsed subscriptions off in bulk with one indexed
+UPDATE ... RETURNING (served by ix_users_premium_expires), then drops the
+affected users' cached snapshots and entitlements. Request paths only read
+the is_premium flag.
+
+Each web process runs its own sweeper; the UPDATE is idempotent, and a
+process that did not flip a row picks the change up when its caches expire.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+
+from .database import SessionLocal
+from .models import User
+
+PREMIUM_SWEEP_INTERVAL_SECONDS = float(os.getenv("PREMIUM_SWEEP_INTERVAL_SECONDS", "60"))
+
+
+class PremiumSweeper:
+    """Periodically revokes premium for users whose premium_expires_at has passed"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._metrics_lock = threading.Lock()
+        self.sweeps = 0
+        self.failed_sweeps = 0
+        self.rows_affected = 0
+        self.last_rows_affected = 0
+        self.last_sweep_ms = 0.0
+        self.max_sweep_ms = 0.0
+        self.total_sweep_ms = 0.0
+        self.last_sweep_at: Optional[str] = None
+
+    def sweep_once(self, now: Optional[datetime] = None) -> List[int]:
+        """Revoke lapsed premium in one statement; returns the affected user ids"""
+        from .auth import invalidate_user
+        from .entitlements import invalidate_entitlements
+
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            user_ids = db.execute(
+                update(User)
+                .where(User.is_premium == 1, User.premium_expires_at.is_not(None), User.premium_expires_at <= now)
+                .values(is_premium=0, path_version=User.path_version + 1)
+                .returning(User.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+        finally:
+            db.close()
+
+        # Caches only after commit, so a concurrent miss can't reload the old flag
+        for user_id in user_ids:
+            invalidate_user(user_id)
+            invalidate_entitlements(user_id)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            self.sweeps += 1
+            self.rows_affected += len(user_ids)
+            self.last_rows_affected = len(user_ids)
+            self.last_sweep_ms = elapsed_ms
+            self.max_sweep_ms = max(self.max_sweep_ms, elapsed_ms)
+            self.total_sweep_ms += elapsed_ms
+            self.last_sweep_at = now.isoformat()
+        if user_ids:
+            print(f"⏳ Premium expired for {len(user_ids)} user(s)")
+        return user_ids
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.sweep_once)
+            except Exception as e:
+                print(f"❌ Premium sweep failed: {e}")
+                with self._metrics_lock:
+                    self.failed_sweeps += 1
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            return {
+                "interval_seconds": self.interval,
+                "sweeps": self.sweeps,
+                "failed_sweeps": self.failed_sweeps,
+                "rows_affected": self.rows_affected,
+                "last_rows_affected": self.last_rows_affected,
+                "last_sweep_ms": round(self.last_sweep_ms, 3),
+                "avg_sweep_ms": round(self.total_sweep_ms / self.sweeps, 3) if self.sweeps else 0.0,
+                "max_sweep_ms": round(self.max_sweep_ms, 3),
+                "last_sweep_at": self.last_sweep_at,
+            }
+
+
+premium_sweeper = PremiumSweeper(interval=PREMIUM_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,293 @@
+"""
+Bulk progress writes for the completion endpoints.
+Video ids are validated with a single IN query and completions are upserted
+with one INSERT ... ON CONFLICT statement inside a single transaction.
+
+Optionally (PROGRESS_WRITE_BEHIND=1) completions are parked in an in-memory,
+per-(user, video) deduplicated buffer and flushed in bulk on a timer or once
+the buffer reaches a size threshold. Reads overlay the buffer so users always
+see their own completions; the buffer is drained on shutdown.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .curriculum import path_version_bump
+from .database import AsyncSessionLocal, upsert_insert
+from .models import UserProgress, UserStats, Video
+
+# Largest batch accepted per request (keeps the IN list under SQLite's bound-parameter limit)
+MAX_BATCH_SIZE = 1000
+# Rows per upsert statement when flushing (bounds the (user_id, video_id) IN list)
+UPSERT_CHUNK_SIZE = 500
+
+PROGRESS_WRITE_BEHIND = os.getenv("PROGRESS_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+PROGRESS_FLUSH_INTERVAL_SECONDS = float(os.getenv("PROGRESS_FLUSH_INTERVAL_SECONDS", "2"))
+PROGRESS_FLUSH_MAX_ROWS = int(os.getenv("PROGRESS_FLUSH_MAX_ROWS", "500"))
+
+
+def normalize_timestamp(value: Optional[datetime], now: datetime) -> str:
+    """Client timestamps become naive-UTC ISO strings, clamped so they can't be in the future"""
+    if value is None:
+        return now.isoformat()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(value, now).isoformat()
+
+
+def completion_row(user_id: int, video_id: int, course_id: Optional[int], completed_at: str) -> dict:
+    return {
+        "user_id": user_id,
+        "video_id": video_id,
+        "course_id": course_id,
+        "is_completed": 1,
+        "completed_at": completed_at,
+    }
+
+
+async def resolve_videos(db: AsyncSession, video_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+    """Map the known ids among `video_ids` to their course_id with one IN query"""
+    known = await db.execute(select(Video.id, Video.course_id).where(Video.id.in_(list(video_ids))))
+    return {video_id: course_id for video_id, course_id in known.all()}
+
+
+async def increment_completed_counts(db: AsyncSession, counts: Dict[int, int]):
+    """Add newly completed videos to user_stats.completed_count (no commit)"""
+    counts = {user_id: count for user_id, count in counts.items() if count}
+    if not counts:
+        return
+    stmt = upsert_insert(UserStats.__table__, db.bind.dialect.name)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"completed_count": UserStats.__table__.c.completed_count + stmt.excluded.completed_count},
+    )
+    await db.execute(stmt, [{"user_id": user_id, "completed_count": count} for user_id, count in counts.items()])
+
+
+async def upsert_rows(db: AsyncSession, rows: List[dict]):
+    """INSERT ... ON CONFLICT (user_id, video_id) DO UPDATE for completion rows (no commit)"""
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        await _upsert_chunk(db, rows[start:start + UPSERT_CHUNK_SIZE])
+
+
+async def _upsert_chunk(db: AsyncSession, rows: List[dict]):
+    if not rows:
+        return
+    table = UserProgress.__table__
+
+    # Only first-time completions move the per-user completed counters. They are counted
+    # from what the writes themselves report, so concurrent flushes can't both count a row.
+    inserted = await db.execute(
+        upsert_insert(table, db.bind.dialect.name)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["user_id", "video_id"])
+        .returning(table.c.user_id, table.c.video_id)
+    )
+    inserted = set(inserted.all())
+    existing = [row for row in rows if (row["user_id"], row["video_id"]) not in inserted]
+
+    newly_completed = [user_id for user_id, _ in inserted]
+    if existing:
+        flipped = await db.execute(
+            update(table)
+            .where(
+                table.c.is_completed == 0,
+                tuple_(table.c.user_id, table.c.video_id).in_([(row["user_id"], row["video_id"]) for row in existing]),
+            )
+            .values(is_completed=1)
+            .returning(table.c.user_id)
+        )
+        newly_completed += flipped.scalars().all()
+
+        stmt = upsert_insert(table, db.bind.dialect.name)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "video_id"],
+            set_={
+                "is_completed": 1,
+                "course_id": stmt.excluded.course_id,
+                "completed_at": stmt.excluded.completed_at,
+            },
+        )
+        await db.execute(stmt, existing)
+
+    await increment_completed_counts(db, Counter(newly_completed))
+    await db.execute(path_version_bump({row["user_id"] for row in rows}))
+
+
+async def record_completions(db: AsyncSession, user_id: int, completions: Dict[int, str]) -> dict:
+    """
+    Record completed progress rows for one user.
+    `completions` maps video_id -> completed_at (ISO string); unknown ids are skipped.
+    """
+    if not completions:
+        return {"recorded": 0, "unknown_video_ids": []}
+
+    course_by_video = await resolve_videos(db, completions.keys())
+    rows = [
+        completion_row(user_id, video_id, course_by_video[video_id], completed_at)
+        for video_id, completed_at in completions.items()
+        if video_id in course_by_video
+    ]
+
+    if progress_buffer.enabled:
+        progress_buffer.add_many(rows)
+    else:
+        await upsert_rows(db, rows)
+        await db.commit()
+
+    return {
+        "recorded": len(rows),
+        "unknown_video_ids": sorted(set(completions) - set(course_by_video)),
+    }
+
+
+# --- Write-behind buffer ---
+class ProgressBuffer:
+    """Deduplicated per-(user, video) completion buffer flushed to the database in bulk"""
+
+    def __init__(self, enabled: bool, flush_interval: float, max_rows: int):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        # user_id -> video_id -> row; `_flushing` holds rows being written so reads still see them
+        self._pending: Dict[int, Dict[int, dict]] = {}
+        self._flushing: Dict[int, Dict[int, dict]] = {}
+        self._depth = 0
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        # Size-triggered flushes; the loop only keeps weak references to tasks
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._metrics_lock = threading.Lock()
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rows_flushed = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def add_many(self, rows: Iterable[dict]):
+        for row in rows:
+            user_rows = self._pending.setdefault(row["user_id"], {})
+            if row["video_id"] not in user_rows:
+                self._depth += 1
+            user_rows[row["video_id"]] = row
+        if self._depth >= self.max_rows:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    def add(self, user_id: int, video_id: int, course_id: Optional[int], completed_at: str):
+        self.add_many([completion_row(user_id, video_id, course_id, completed_at)])
+
+    def _buffered(self, user_id: int) -> Iterable[dict]:
+        yield from self._flushing.get(user_id, {}).values()
+        yield from self._pending.get(user_id, {}).values()
+
+    def completed_video_ids(self, user_id: int, course_id: Optional[int] = None) -> Set[int]:
+        """Buffered (not yet durable) completions for read-your-writes overlays"""
+        return {
+            row["video_id"]
+            for row in self._buffered(user_id)
+            if course_id is None or row["course_id"] == course_id
+        }
+
+    def buffered_rows(self, user_id: int) -> List[dict]:
+        return list(self._buffered(user_id))
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            self._depth = 0
+            rows = [row for user_rows in self._flushing.values() for row in user_rows.values()]
+
+            started = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    await upsert_rows(db, rows)
+                    await db.commit()
+            except BaseException as e:
+                # Includes cancellation: the rows go back to the buffer either way
+                self._requeue_flushing()
+                if not isinstance(e, Exception):
+                    raise
+                print(f"❌ Progress flush failed ({len(rows)} rows), will retry: {e}")
+                self.failed_flushes += 1
+                return
+            finally:
+                self._flushing = {}
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._metrics_lock:
+                self.flushes += 1
+                self.rows_flushed += len(rows)
+                self.last_flush_rows = len(rows)
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self.total_flush_ms += elapsed_ms
+
+    def _requeue_flushing(self):
+        # Anything buffered since the swap wins over the rows being written
+        for user_id, user_rows in self._flushing.items():
+            for video_id, row in user_rows.items():
+                self._pending.setdefault(user_id, {}).setdefault(video_id, row)
+        self._depth = sum(len(user_rows) for user_rows in self._pending.values())
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._stop = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the timer (letting an in-flight flush finish) and drain whatever is still buffered"""
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            return {
+                "enabled": self.enabled,
+                "depth": self._depth,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "rows_flushed": self.rows_flushed,
+                "last_flush_rows": self.last_flush_rows,
+                "avg_rows_per_flush": round(self.rows_flushed / self.flushes, 1) if self.flushes else 0.0,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+                "max_flush_ms": round(self.max_flush_ms, 3),
+            }
+
+
+progress_buffer = ProgressBuffer(
+    enabled=PROGRESS_WRITE_BEHIND,
+    flush_interval=PROGRESS_FLUSH_INTERVAL_SECONDS,
+    max_rows=PROGRESS_FLUSH_MAX_ROWS,
+)
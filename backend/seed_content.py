@@ -6,7 +6,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.ingestion.scraper import YouTubeScraper
 from backend.ingestion.validator import VideoValidator
-from backend.models import Video, Base, DifficultyLevel
+from backend.ingestion.writer import VideoWriter
+from backend.models import Base, DifficultyLevel
 from backend.main import SessionLocal, engine
 from sqlalchemy.orm import Session
 
@@ -25,7 +26,8 @@ def seed_content():
         ("Advanced stitching masterclass", DifficultyLevel.INTERMEDIATE) # Mapping to Intermediate for now as per validator logic
     ]
     
-    total_added = 0
+    # Seeded videos go to course 1, the Video.course_id column default they had before
+    writer = VideoWriter(db, course_id=1)
     
     for query, target_difficulty in queries:
         print(f"\n--- Processing Query: '{query}' ---")
@@ -37,17 +39,8 @@ def seed_content():
             validated_video = validator.validate(vid_meta)
             
             if validated_video:
-                # 2. Check for duplicates
-                existing = db.query(Video).filter(Video.url == validated_video.url).first()
-                if existing:
-                    print(f"Skipping duplicate: {validated_video.title}")
-                    continue
-                
-                # 3. Save to DB
-                # Determine order index (simple auto-increment for now)
-                count = db.query(Video).count()
-                
-                new_video = Video(
+                # 2. Queue for a bulk insert; duplicates are skipped in memory and by ON CONFLICT
+                queued = writer.add(
                     title=validated_video.title,
                     url=validated_video.url,
                     description=validated_video.description[:500] if validated_video.description else "",
@@ -57,15 +50,17 @@ def seed_content():
                     resolution_height=validated_video.resolution_height,
                     difficulty_level=validated_video.difficulty, # Validator sets this
                     cluster_name="General Stitching",
-                    order_index=count + 1
                 )
-                
-                db.add(new_video)
-                db.commit()
-                print(f"[ADDED] {validated_video.title} ({validated_video.difficulty})")
-                total_added += 1
+                if queued:
+                    print(f"[QUEUED] {validated_video.title} ({validated_video.difficulty})")
+                else:
+                    print(f"Skipping duplicate: {validated_video.title}")
             else:
                 print(f"[REJECTED] {vid_meta.title}")
+    
+    # 3. Save to DB
+    writer.flush()
+    total_added = writer.inserted
 
     print(f"\n\nIngestion Complete! Added {total_added} new videos.")
     db.close()
@@ -1,49 +1,158 @@
 import stripe
+import json
 import os
-from typing import Optional
+import threading
+import time
+from typing import Callable, Hashable, Optional
 from datetime import datetime, timedelta
 
+from .cache import TTLCache
+
 # Stripe API Configuration
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_YOUR_KEY_HERE")
+# Point at a local stand-in of the Stripe API for tests/benchmarks
+stripe.api_base = os.getenv("STRIPE_API_BASE", stripe.api_base)
+
+# --- HTTP client ---
+# Pooled (keep-alive) requests sessions with explicit connect/read timeouts
+# instead of the library's 80s default; retries reuse Stripe idempotency keys.
+STRIPE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("STRIPE_CONNECT_TIMEOUT_SECONDS", "3"))
+STRIPE_READ_TIMEOUT_SECONDS = float(os.getenv("STRIPE_READ_TIMEOUT_SECONDS", "10"))
+stripe.max_network_retries = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "1"))
+stripe.default_http_client = stripe.http_client.RequestsClient(
+    timeout=(STRIPE_CONNECT_TIMEOUT_SECONDS, STRIPE_READ_TIMEOUT_SECONDS)
+)
 
 # Per-course pricing (£2 per course)
 COURSE_PRICE_GBP = 2.00
 
+# catalog_key -> Stripe price id, written by create_stripe_products.py
+PRICE_MAP_PATH = os.getenv("STRIPE_PRICE_MAP_PATH", "./stripe_prices.json")
+
+# --- Checkout session reuse ---
+# Repeat clicks within the TTL get the same open session URL back. Sessions are
+# created with an explicit expiry so a cached URL always outlives its cache entry.
+CHECKOUT_SESSION_EXPIRY_SECONDS = max(int(os.getenv("CHECKOUT_SESSION_EXPIRY_SECONDS", "3600")), 1800)  # Stripe minimum is 30 min
+CHECKOUT_CACHE_TTL_SECONDS = min(
+    float(os.getenv("CHECKOUT_CACHE_TTL_SECONDS", "900")),
+    CHECKOUT_SESSION_EXPIRY_SECONDS - 300,
+)
+CHECKOUT_CACHE_MAX_SIZE = int(os.getenv("CHECKOUT_CACHE_MAX_SIZE", "10000"))
+
+checkout_cache = TTLCache(maxsize=CHECKOUT_CACHE_MAX_SIZE, ttl=CHECKOUT_CACHE_TTL_SECONDS)
+# Striped locks so concurrent double-clicks for one key create a single session
+_checkout_locks = [threading.Lock() for _ in range(64)]
+
+
+def _reuse_checkout(key: Hashable, create: Callable[[], dict]) -> dict:
+    with _checkout_locks[hash(key) % len(_checkout_locks)]:
+        cached = checkout_cache.get(key)
+        if cached is not None:
+            return cached
+        session = create()
+        checkout_cache.set(key, session)
+        return session
+
+
+def course_checkout_key(user_id: int, course_id: int) -> tuple:
+    return (user_id, "course", course_id)
+
+
+def plan_checkout_key(user_id: int, price_id: str) -> tuple:
+    return (user_id, "plan", price_id)
+
+
 class StripeHandler:
     """Handles all Stripe payment operations for per-course purchases"""
     
+    # Subscription / one-off premium prices (overridden by the price map at startup)
+    PRICE_ONE_TIME = os.getenv("STRIPE_PRICE_ONE_TIME", "price_one_time_placeholder")
+    PRICE_MONTHLY = os.getenv("STRIPE_PRICE_MONTHLY", "price_monthly_placeholder")
+    # Provisioned price ids by catalog key ("premium_lifetime", "course_<id>", ...)
+    PRICE_MAP: dict = {}
+    
     @staticmethod
-    def create_course_checkout_session(
-        user_email: str,
-        course_id: int,
-    def create_course_checkout_session(user_email: str, course_id: int, course_title: str, success_url: str, cancel_url: str) -> dict:
-        """Create a Stripe checkout session for purchasing a single course"""
-        try:
-            session = stripe.checkout.Session.create(
-                payment_method_types=['card'],
-                line_items=[{
-                    'price_data': {
-                        'currency': 'gbp',
-                        'unit_amount': int(COURSE_PRICE_GBP * 100),  # £2.00 in pence
-                        'product_data': {
-                            'name': f'Course: {course_title}',
-                            'description': f'Lifetime access to {course_title}',
-                        },
-                    },
-                    'quantity': 1,
-                }],
-                mode='payment',
-                success_url=success_url,
-                cancel_url=cancel_url,
-                customer_email=user_email,
-                metadata={
-                    'course_id': course_id,
-                    'user_email': user_email,
-                }
-            )
-            return {"url": session.url, "session_id": session.id}
-        except Exception as e:
-            raise Exception(f"Failed to create checkout session: {str(e)}")
+    def load_price_map(path: str = PRICE_MAP_PATH) -> dict:
+        """Load provisioned price ids so checkout never has to look them up"""
+        if not os.path.exists(path):
+            print(f"⚠️  No Stripe price map at {path}; using env/placeholder prices")
+            return StripeHandler.PRICE_MAP
+        with open(path) as f:
+            StripeHandler.PRICE_MAP = json.load(f)
+        StripeHandler.PRICE_ONE_TIME = StripeHandler.PRICE_MAP.get("premium_lifetime", StripeHandler.PRICE_ONE_TIME)
+        StripeHandler.PRICE_MONTHLY = StripeHandler.PRICE_MAP.get("premium_monthly", StripeHandler.PRICE_MONTHLY)
+        print(f"Loaded {len(StripeHandler.PRICE_MAP)} Stripe prices from {path}")
+        return StripeHandler.PRICE_MAP
+    
+    @staticmethod
+    def _course_line_item(course_id: int, course_title: str) -> dict:
+        price_id = StripeHandler.PRICE_MAP.get(f"course_{course_id}")
+        if price_id:
+            return {'price': price_id, 'quantity': 1}
+        # Not provisioned: describe the price inline
+        return {
+            'price_data': {
+                'currency': 'gbp',
+                'unit_amount': int(COURSE_PRICE_GBP * 100),  # £2.00 in pence
+                'product_data': {
+                    'name': f'Course: {course_title}',
+                    'description': f'Lifetime access to {course_title}',
+                },
+            },
+            'quantity': 1,
+        }
+    
+    @staticmethod
+    def create_course_checkout_session(user_email: str, course_id: int, course_title: str, success_url: str, cancel_url: str,
+                                       user_id: Optional[int] = None) -> dict:
+        """Create (or reuse, when user_id is given) a Stripe checkout session for purchasing a single course"""
+        def create():
+            try:
+                session = stripe.checkout.Session.create(
+                    payment_method_types=['card'],
+                    line_items=[StripeHandler._course_line_item(course_id, course_title)],
+                    mode='payment',
+                    success_url=success_url,
+                    cancel_url=cancel_url,
+                    customer_email=user_email,
+                    expires_at=int(time.time()) + CHECKOUT_SESSION_EXPIRY_SECONDS,
+                    metadata={
+                        'course_id': course_id,
+                        'user_email': user_email,
+                    }
+                )
+                return {"url": session.url, "session_id": session.id}
+            except Exception as e:
+                raise Exception(f"Failed to create checkout session: {str(e)}")
+        
+        if user_id is None:
+            return create()
+        return _reuse_checkout(course_checkout_key(user_id, course_id), create)
+    
+    @staticmethod
+    def create_checkout_session(user_email: str, user_id: int, price_id: str, success_url: str, cancel_url: str) -> str:
+        """Create (or reuse) a checkout session for a premium plan; returns the checkout URL"""
+        def create():
+            try:
+                session = stripe.checkout.Session.create(
+                    payment_method_types=['card'],
+                    line_items=[{'price': price_id, 'quantity': 1}],
+                    mode='subscription' if price_id == StripeHandler.PRICE_MONTHLY else 'payment',
+                    success_url=success_url,
+                    cancel_url=cancel_url,
+                    customer_email=user_email,
+                    expires_at=int(time.time()) + CHECKOUT_SESSION_EXPIRY_SECONDS,
+                    metadata={
+                        'user_id': user_id,
+                        'user_email': user_email,
+                        'price_id': price_id,
+                    }
+                )
+                return {"url": session.url, "session_id": session.id}
+            except Exception as e:
+                raise Exception(f"Failed to create checkout session: {str(e)}")
+        
+        return _reuse_checkout(plan_checkout_key(user_id, price_id), create)["url"]
     
     @staticmethod
     def verify_webhook_signature(payload: bytes, sig_header: str) -> dict:
@@ -59,9 +168,59 @@ class StripeHandler:
             raise
     
     
+    @staticmethod
+    def process_event(event: dict) -> Optional[dict]:
+        """
+        Apply a verified webhook event exactly once. Runs on a worker thread
+        with its own session. The ledger row and the side effects commit
+        together, so a failed event is not recorded and Stripe's retry is
+        processed normally. Returns None for duplicates and ignored types.
+        """
+        from .database import SessionLocal, upsert_insert
+        from .models import StripeEvent
+
+        db = SessionLocal()
+        try:
+            # Claim the event id; a duplicate delivery inserts nothing
+            stmt = upsert_insert(StripeEvent.__table__, db.get_bind().dialect.name)
+            claimed = db.execute(
+                stmt.values(id=event['id'], type=event['type']).on_conflict_do_nothing(index_elements=["id"])
+            )
+            if claimed.rowcount == 0:
+                db.rollback()
+                return None
+
+            result = None
+            session = event['data']['object']
+            metadata = session.get('metadata') or {}
+            # Plan (premium) checkouts carry no course_id and have no course to fulfil
+            if event['type'] == 'checkout.session.completed' and 'course_id' in metadata:
+                result = StripeHandler.handle_course_purchase(session, db)
+            db.commit()
+            if event['type'] == 'checkout.session.completed' and 'course_id' not in metadata:
+                StripeHandler.forget_plan_checkout(metadata)
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    @staticmethod
+    def forget_plan_checkout(metadata: dict):
+        """Drop a completed plan session from the reuse cache so the next click starts a new one"""
+        if 'user_id' not in metadata:
+            return
+        user_id = int(metadata['user_id'])
+        # Sessions created before price_id was recorded: drop both plans
+        price_ids = [metadata['price_id']] if metadata.get('price_id') else [StripeHandler.PRICE_ONE_TIME, StripeHandler.PRICE_MONTHLY]
+        for price_id in price_ids:
+            checkout_cache.invalidate(plan_checkout_key(user_id, price_id))
+    
     @staticmethod
     def handle_course_purchase(session: dict, db) -> dict:
-        """Process successful course purchase and create CoursePurchase record"""
+        """Process successful course purchase and upsert its CoursePurchase record"""
+        from .database import upsert_insert
         from .models import CoursePurchase
         
         course_id = int(session['metadata']['course_id'])
@@ -75,19 +234,35 @@ class StripeHandler:
         if not user:
             raise Exception(f"User not found: {user_email}")
         
-        # Create course purchase record
-        purchase = CoursePurchase(
-            user_id=user.id,
-            course_id=course_id,
-            stripe_payment_id=payment_id,
-            amount_paid=COURSE_PRICE_GBP
-        )
-        db.add(purchase)
+        # Create the purchase unless this user already owns the course
+        stmt = upsert_insert(CoursePurchase.__table__, db.get_bind().dialect.name)
+        created = db.execute(
+            stmt.values(
+                user_id=user.id,
+                course_id=course_id,
+                stripe_payment_id=payment_id,
+                amount_paid=COURSE_PRICE_GBP
+            ).on_conflict_do_nothing(index_elements=["user_id", "course_id"])
+        ).rowcount > 0
+        if created:
+            from .curriculum import path_version_bump
+            db.execute(path_version_bump([user.id]))
+        purchased_at = db.query(CoursePurchase.purchased_at).filter(
+            CoursePurchase.user_id == user.id,
+            CoursePurchase.course_id == course_id
+        ).scalar()
         db.commit()
         
+        # Cached auth snapshot and entitlements may now be stale
+        from .auth import invalidate_user
+        from .entitlements import invalidate_entitlements
+        invalidate_user(user.id)
+        invalidate_entitlements(user.id)
+        checkout_cache.invalidate(course_checkout_key(user.id, course_id))
+        
         return {
             'user_id': user.id,
             'course_id': course_id,
-            'purchased_at': purchase.purchased_at
+            'purchased_at': purchased_at,
+            'created': created
         }
-
@@ -0,0 +1,103 @@
+"""
+Shared fixtures for the API tests.
+The engines are bound when backend.database is imported, so the environment
+points the app at a throwaway SQLite file (and keeps background workers and
+argon2 cheap) before anything from backend is imported.
+"""
+
+import os
+import tempfile
+
+_TEST_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}"
+os.environ["OUTBOX_WORKER"] = "external"
+os.environ["PREMIUM_SWEEP_INTERVAL_SECONDS"] = "0"
+os.environ["STRIPE_WEBHOOK_SECRET"] = "whsec_test_secret"
+os.environ["STRIPE_PRICE_MAP_PATH"] = os.path.join(_TEST_DIR, "stripe_prices.json")
+os.environ["STRIPE_CATALOG_SNAPSHOT_PATH"] = os.path.join(_TEST_DIR, "stripe_catalog_snapshot.json")
+os.environ["HASH_EXECUTOR"] = "thread"
+os.environ["ARGON2_TIME_COST"] = "1"
+os.environ["ARGON2_MEMORY_COST"] = "1024"
+os.environ["ARGON2_PARALLELISM"] = "1"
+
+import pytest
+import stripe
+from fastapi.testclient import TestClient
+
+from backend import auth, curriculum, entitlements, main, stripe_handler
+from backend.database import SessionLocal
+from backend.models import Base, Course, User, Video
+
+from .stripe_stub import StripeStub
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def clean_state(client, monkeypatch):
+    """Empty every table and drop the in-process caches between tests"""
+    db = SessionLocal()
+    try:
+        for table in reversed(Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
+    finally:
+        db.close()
+
+    auth.user_cache.clear()
+    entitlements.entitlement_cache.clear()
+    stripe_handler.checkout_cache.clear()
+    main.admin_stats_cache.clear()
+    curriculum._layouts.clear()
+    curriculum.content_version.bump()
+    monkeypatch.setattr(curriculum, "progress_versions", curriculum.ProgressVersions())
+    yield
+
+
+@pytest.fixture
+def stripe_stub(monkeypatch):
+    """Local Stripe API stand-in; every stripe.* call in the test goes to it"""
+    stub = StripeStub().start()
+    monkeypatch.setattr(stripe, "api_base", stub.url)
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def make_user(db, email: str, **columns) -> User:
+    user = User(**{"email": email, "hashed_password": "not-a-real-hash", "is_admin": 0, "is_premium": 0, **columns})
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {auth.create_user_token(user)}"}
+
+
+@pytest.fixture
+def course_with_videos(db):
+    """One course with three videos in path order; returns (course_id, [video_id, ...])"""
+    course = Course(title="Adulting 101", description="Basics", difficulty="beginner", video_count=0)
+    db.add(course)
+    db.commit()
+    videos = [
+        Video(title=f"Lesson {i}", url=f"https://www.youtube.com/watch?v=lesson{i}", course_id=course.id, order_index=i)
+        for i in range(1, 4)
+    ]
+    db.add_all(videos)
+    db.commit()
+    return course.id, [video.id for video in videos]
@@ -0,0 +1,128 @@
+"""
+In-process stand-in for the parts of the Stripe API the backend calls
+(checkout sessions, products, prices). Point stripe.api_base at `url` and
+inspect `requests` / the stored objects from the test.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+
+def _nest(pairs: List[Tuple[str, str]]) -> dict:
+    """Decode Stripe's form encoding (metadata[key]=v, recurring[interval]=v) one level deep"""
+    params: dict = {}
+    for key, value in pairs:
+        if "[" in key:
+            outer, inner = key.split("[", 1)
+            params.setdefault(outer, {})[inner.rstrip("]")] = value
+        else:
+            params[key] = value
+    return params
+
+
+class StripeStub:
+    def __init__(self):
+        self.requests: List[Tuple[str, str, dict]] = []
+        self.products: Dict[str, dict] = {}
+        self.prices: Dict[str, dict] = {}
+        self.sessions: Dict[str, dict] = {}
+        self._ids = count(1)
+        self._idempotent: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self) -> "StripeStub":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def calls(self, method: str, path: str) -> int:
+        return sum(1 for m, p, _ in self.requests if m == method and p == path)
+
+    # --- Resources ---
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def create_product(self, params: dict) -> dict:
+        product = {"id": self._new_id("prod"), "object": "product", "active": True,
+                   "name": params.get("name"), "metadata": params.get("metadata", {})}
+        self.products[product["id"]] = product
+        return product
+
+    def create_price(self, params: dict) -> dict:
+        recurring = params.get("recurring")
+        price = {"id": self._new_id("price"), "object": "price", "active": True,
+                 "product": params["product"], "unit_amount": int(params["unit_amount"]),
+                 "currency": params["currency"], "lookup_key": params.get("lookup_key"),
+                 "recurring": {"interval": recurring["interval"]} if recurring else None}
+        self.prices[price["id"]] = price
+        return price
+
+    def create_session(self, params: dict) -> dict:
+        session_id = self._new_id("cs_test")
+        session = {"id": session_id, "object": "checkout.session", "mode": params.get("mode"),
+                   "url": f"https://checkout.stripe.test/{session_id}", "metadata": params.get("metadata", {}),
+                   "expires_at": int(params["expires_at"]) if "expires_at" in params else None}
+        self.sessions[session_id] = session
+        return session
+
+    def _list(self, objects: Dict[str, dict], path: str) -> dict:
+        return {"object": "list", "url": path, "has_more": False, "data": list(objects.values())}
+
+    def _dispatch(self, method: str, path: str, params: dict, idempotency_key: str) -> Tuple[int, dict]:
+        with self._lock:
+            self.requests.append((method, path, params))
+            if idempotency_key and idempotency_key in self._idempotent:
+                return 200, self._idempotent[idempotency_key]
+            routes = {
+                ("GET", "/v1/products"): lambda: self._list(self.products, path),
+                ("GET", "/v1/prices"): lambda: self._list(self.prices, path),
+                ("POST", "/v1/products"): lambda: self.create_product(params),
+                ("POST", "/v1/prices"): lambda: self.create_price(params),
+                ("POST", "/v1/checkout/sessions"): lambda: self.create_session(params),
+            }
+            route = routes.get((method, path))
+            if route is None:
+                return 404, {"error": {"type": "invalid_request_error", "message": f"No stub for {method} {path}"}}
+            body = route()
+            if idempotency_key:
+                self._idempotent[idempotency_key] = body
+            return 200, body
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method: str):
+                url = urlsplit(self.path)
+                pairs = parse_qsl(url.query)
+                if method == "POST":
+                    length = int(self.headers.get("Content-Length") or 0)
+                    pairs += parse_qsl(self.rfile.read(length).decode())
+                status, body = stub._dispatch(method, url.path, _nest(pairs), self.headers.get("Idempotency-Key"))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
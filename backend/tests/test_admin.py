@@ -0,0 +1,59 @@
+"""
+Admin listing: /admin/dashboard keyset-paginates users on id (next_cursor is
+None on the last page) and /admin/users/export streams every user as NDJSON.
+"""
+
+import json
+
+from backend import main
+
+from .conftest import auth_headers, make_user
+
+
+def test_dashboard_pages_through_users(client, db):
+    admin = make_user(db, "admin@example.com", is_admin=1)
+    ids = [admin.id] + [make_user(db, f"user{i}@example.com").id for i in range(6)]
+    headers = auth_headers(admin)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3} if cursor is None else {"limit": 3, "cursor": cursor}
+        body = client.get("/admin/dashboard", params=params, headers=headers).json()
+        pages += 1
+        seen += [user["id"] for user in body["users"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+        assert cursor == body["users"][-1]["id"]
+
+    assert seen == ids
+    assert pages == 3
+
+    # A full last page still reports no further page
+    last = client.get("/admin/dashboard", params={"limit": 7}, headers=headers).json()
+    assert len(last["users"]) == 7
+    assert last["next_cursor"] is None
+    assert client.get("/admin/dashboard", params={"cursor": ids[-1]}, headers=headers).json()["users"] == []
+    assert client.get("/admin/dashboard", params={"limit": 0}, headers=headers).status_code == 422
+
+
+def test_dashboard_and_export_require_admin(client, db):
+    headers = auth_headers(make_user(db, "learner@example.com"))
+    assert client.get("/admin/dashboard", headers=headers).status_code == 403
+    assert client.get("/admin/users/export", headers=headers).status_code == 403
+
+
+def test_export_streams_every_user(client, db, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_EXPORT_BATCH_SIZE", 2)
+    admin = make_user(db, "admin@example.com", is_admin=1)
+    users = [admin] + [make_user(db, f"user{i}@example.com", is_premium=i % 2) for i in range(4)]
+
+    response = client.get("/admin/users/export", headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": u.id, "email": u.email, "is_admin": u.is_admin, "is_premium": u.is_premium, "created_at": u.created_at}
+        for u in users
+    ]
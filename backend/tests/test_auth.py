@@ -0,0 +1,69 @@
+"""
+Register/login await the hashing pool instead of blocking a worker thread,
+and fail fast with 503 when the pool is saturated; a cancelled request keeps
+its pool slot until the hash it started has finished.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from backend.hashing import HashingPool, HashingPoolBusy, hashing_pool
+
+
+def test_register_then_login(client):
+    registered = client.post("/auth/register", json={"email": "new@example.com", "password": "s3cret"})
+    assert registered.status_code == 200
+
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {registered.json()['access_token']}"})
+    assert me.json()["email"] == "new@example.com"
+
+    assert client.post("/auth/register", json={"email": "new@example.com", "password": "other"}).status_code == 400
+    assert client.post("/auth/token", data={"username": "new@example.com", "password": "s3cret"}).status_code == 200
+    assert client.post("/auth/token", data={"username": "new@example.com", "password": "wrong"}).status_code == 401
+
+
+def test_saturated_hashing_pool_answers_503(client):
+    client.post("/auth/register", json={"email": "busy@example.com", "password": "s3cret"})
+    for _ in range(hashing_pool.max_pending):
+        hashing_pool._slots.acquire()
+    try:
+        response = client.post("/auth/token", data={"username": "busy@example.com", "password": "s3cret"})
+        assert response.status_code == 503
+        assert response.headers["retry-after"]
+    finally:
+        for _ in range(hashing_pool.max_pending):
+            hashing_pool._slots.release()
+
+
+def test_cancelled_await_keeps_slot_until_job_finishes():
+    pool = HashingPool(workers=1, max_pending=1, use_processes=False)
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_hash(password):
+        started.set()
+        finish.wait(5)
+        return f"hashed:{password}"
+
+    async def scenario():
+        task = asyncio.create_task(pool._run_async(slow_hash, "pw"))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # argon2 is still running in the executor, so its slot is still taken
+        with pytest.raises(HashingPoolBusy):
+            await pool._run_async(slow_hash, "other")
+
+        finish.set()
+        await asyncio.to_thread(pool.shutdown)
+        return await pool._run_async(lambda password: f"hashed:{password}", "again")
+
+    try:
+        assert asyncio.run(scenario()) == "hashed:again"
+    finally:
+        finish.set()
+        pool.shutdown()
+    assert (pool.completed, pool.rejected) == (2, 1)
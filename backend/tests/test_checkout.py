@@ -0,0 +1,64 @@
+"""
+Checkout sessions against the local Stripe stub: repeat clicks reuse the open
+session, and completing it lets the next click start a fresh one.
+"""
+
+import time
+
+from backend.stripe_handler import CHECKOUT_SESSION_EXPIRY_SECONDS, StripeHandler
+
+from .conftest import auth_headers, make_user
+
+
+def _complete(stub, session_url: str, event_id: str, **session_fields):
+    session = next(s for s in stub.sessions.values() if s["url"] == session_url)
+    return StripeHandler.process_event({
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {"object": {**session, **session_fields}},
+    })
+
+
+def test_plan_checkout_is_reused_until_completed(client, db, stripe_stub):
+    user = make_user(db, "subscriber@example.com")
+    headers = auth_headers(user)
+
+    first = client.post("/payment/create-checkout", json={"plan": "monthly"}, headers=headers).json()["checkout_url"]
+    again = client.post("/payment/create-checkout", json={"plan": "monthly"}, headers=headers).json()["checkout_url"]
+    assert again == first
+    assert stripe_stub.calls("POST", "/v1/checkout/sessions") == 1
+
+    session = next(iter(stripe_stub.sessions.values()))
+    assert session["mode"] == "subscription"
+    assert session["metadata"]["price_id"] == StripeHandler.PRICE_MONTHLY
+    assert session["expires_at"] >= int(time.time()) + CHECKOUT_SESSION_EXPIRY_SECONDS - 60
+
+    _complete(stripe_stub, first, "evt_plan_paid")
+
+    after = client.post("/payment/create-checkout", json={"plan": "monthly"}, headers=headers).json()["checkout_url"]
+    assert after != first
+    assert stripe_stub.calls("POST", "/v1/checkout/sessions") == 2
+
+
+def test_other_plan_gets_its_own_session(client, db, stripe_stub):
+    headers = auth_headers(make_user(db, "subscriber@example.com"))
+
+    monthly = client.post("/payment/create-checkout", json={"plan": "monthly"}, headers=headers).json()["checkout_url"]
+    one_time = client.post("/payment/create-checkout", json={"plan": "one_time"}, headers=headers).json()["checkout_url"]
+    assert monthly != one_time
+    assert stripe_stub.calls("POST", "/v1/checkout/sessions") == 2
+
+
+def test_course_checkout_is_reused_until_purchased(client, db, stripe_stub, course_with_videos):
+    course_id, _ = course_with_videos
+    user = make_user(db, "buyer@example.com")
+    headers = auth_headers(user)
+    url = f"/payment/purchase-course/{course_id}"
+
+    first = client.post(url, headers=headers).json()["checkout_url"]
+    assert client.post(url, headers=headers).json()["checkout_url"] == first
+    assert stripe_stub.calls("POST", "/v1/checkout/sessions") == 1
+
+    result = _complete(stripe_stub, first, "evt_course_paid", payment_intent="pi_course")
+    assert result["created"]
+    assert client.post(url, headers=headers).status_code == 400
@@ -0,0 +1,49 @@
+"""
+Owned courses on the curriculum paths: nodes of a purchased course are all
+unlocked on /path and /courses/{id}/path, while other courses keep the
+one-active-node progression; admins and premium users see everything.
+"""
+
+from backend import entitlements
+from backend.models import Course, CoursePurchase, Video
+
+from .conftest import auth_headers, make_user
+
+
+def _statuses(response):
+    return [node["status"] for node in response.json()]
+
+
+def _second_course(db) -> int:
+    course = Course(title="Cooking", description="Knife skills", difficulty="beginner", video_count=0)
+    db.add(course)
+    db.commit()
+    db.add_all([
+        Video(title=f"Cooking {i}", url=f"https://www.youtube.com/watch?v=cook{i}", course_id=course.id, order_index=i)
+        for i in range(1, 3)
+    ])
+    db.commit()
+    return course.id
+
+
+def test_owned_course_unlocks_on_full_path(client, db, course_with_videos):
+    course_id, video_ids = course_with_videos
+    owned_id = _second_course(db)
+    user = make_user(db, "buyer@example.com")
+    db.add(CoursePurchase(user_id=user.id, course_id=owned_id, stripe_payment_id="pi_owned", amount_paid=2.0))
+    db.commit()
+    headers = auth_headers(user)
+
+    assert _statuses(client.get("/path", headers=headers)) == ["active", "locked", "locked", "active", "active"]
+    assert _statuses(client.get(f"/courses/{owned_id}/path", headers=headers)) == ["active", "active"]
+    assert _statuses(client.get(f"/courses/{course_id}/path", headers=headers)) == ["active", "locked", "locked"]
+    assert entitlements.entitlement_cache.get(user.id).owned_courses == frozenset({owned_id})
+
+    client.post("/progress/complete", json={"video_id": video_ids[0]}, headers=headers)
+    assert _statuses(client.get("/path", headers=headers)) == ["completed", "active", "locked", "active", "active"]
+
+
+def test_admin_and_premium_unlock_everything(client, db, course_with_videos):
+    _second_course(db)
+    for user in (make_user(db, "admin@example.com", is_admin=1), make_user(db, "premium@example.com", is_premium=1)):
+        assert _statuses(client.get("/path", headers=auth_headers(user))) == ["active"] * 5
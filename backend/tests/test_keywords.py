@@ -0,0 +1,80 @@
+"""
+Keyword matching for ingestion filters: the prefix-factored regex matches the
+same whole words/phrases as checking each keyword on its own, and search()
+reports the keyword that actually matched.
+"""
+
+import re
+
+import pytest
+
+from backend.ingestion.keywords import KeywordMatcher, _trie_pattern, matcher_for
+from backend.ingestion.validator import VideoValidator
+
+KEYWORDS = ["intro", "introduction", "stream", "stream highlight", "fail", "c++"]
+
+
+def _reference(keywords, *texts):
+    """Keywords found as whole words, checked one keyword at a time"""
+    found = set()
+    for text in texts:
+        for keyword in keywords:
+            if text and re.search(rf"(?<!\w){re.escape(keyword)}(?!\w)", text.lower()):
+                found.add(keyword)
+    return found
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Keywords that are prefixes of other keywords
+    ("Introduction to Rust", "introduction"),
+    ("Rust intro", "intro"),
+    ("intros and outros", None),
+    ("reintroduction, then an intro", "intro"),
+    # Multi-word phrases
+    ("Best stream highlight ever", "stream highlight"),
+    ("Stream highlights", "stream"),
+    ("streamhighlight", None),
+    ("stream  highlight", "stream"),
+    # Punctuation boundaries
+    ("(intro)", "intro"),
+    ("INTRO: part 1", "intro"),
+    ("stream-highlight", "stream"),
+    ("epic fail!", "fail"),
+    ("failsafe", None),
+    ("learn c++ today", "c++"),
+    ("c++17 features", None),
+    ("", None),
+])
+def test_search_reports_matched_keyword(text, expected):
+    assert KeywordMatcher(KEYWORDS).search(text) == expected
+    assert (expected is not None) == bool(_reference(KEYWORDS, text))
+
+
+def test_search_checks_texts_in_order():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.search(None, "nothing here", "an intro", "epic fail") == "intro"
+    assert matcher.search(None, "") is None
+    assert KeywordMatcher([" ", ""]).search("intro") is None
+
+
+def test_matches_agree_with_per_keyword_search():
+    keywords = VideoValidator.NEGATIVE_KEYWORDS | VideoValidator.BEGINNER_KEYWORDS
+    matcher = KeywordMatcher(keywords)
+    words = sorted(keywords) + ["funnybones", "starter", "guides", "react", "a", "-", "!", "101st"]
+    texts = [f"{a} {b}{sep}{c}" for a in words[:12] for b in words for c in words[::5] for sep in (" ", ".", "")]
+
+    for text in texts:
+        found = matcher.search(text)
+        expected = _reference(keywords, text)
+        assert (found is not None) == bool(expected), text
+        assert found is None or found in expected, text
+
+
+def test_trie_pattern_factors_prefixes():
+    assert _trie_pattern(["fail", "funny"]) == "f(?:ail|unny)"
+    assert _trie_pattern(["intro", "introduction"]) == "intro(?:duction)?"
+
+
+def test_matcher_for_is_shared_per_keyword_set():
+    assert matcher_for(["Fail", "intro"]) is matcher_for(("intro", "fail"))
+    assert matcher_for(["fail"]) is not matcher_for(["intro"])
@@ -0,0 +1,71 @@
+"""
+Schema migrations against a legacy database: user_progress is rebuilt from
+the string user_id schema with course_id filled in from videos, and running
+the migrations again changes nothing.
+"""
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.types import Integer
+
+from backend.migrations import run_migrations
+from backend.models import Base, UserProgress, UserStats
+
+LEGACY_USER_PROGRESS = """
+    CREATE TABLE user_progress (
+        user_id VARCHAR NOT NULL,
+        video_id INTEGER NOT NULL,
+        is_completed INTEGER,
+        completed_at VARCHAR,
+        PRIMARY KEY (user_id, video_id)
+    )
+"""
+
+
+def test_user_progress_rebuilt_from_legacy_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine, tables=[t for t in Base.metadata.sorted_tables if t.name != "user_progress"])
+    with engine.begin() as connection:
+        connection.execute(text(LEGACY_USER_PROGRESS))
+        connection.execute(text("CREATE INDEX ix_user_progress_user_id ON user_progress (user_id)"))
+        connection.execute(text("CREATE INDEX ix_user_progress_video_id ON user_progress (video_id)"))
+        connection.execute(text("INSERT INTO users (id, email, hashed_password, is_admin, is_premium) "
+                                "VALUES (1, 'a@example.com', 'x', 0, 0), (2, 'b@example.com', 'x', 0, 0)"))
+        connection.execute(text("INSERT INTO videos (id, title, url, course_id, order_index) "
+                                "VALUES (10, 'One', 'u1', 5, 1), (11, 'Two', 'u2', 5, 2)"))
+        connection.execute(text("""
+            INSERT INTO user_progress (user_id, video_id, is_completed, completed_at) VALUES
+                ('1', 10, 1, '2024-01-01T00:00:00'),
+                ('1', 11, 0, NULL),
+                ('2', 10, 1, '2024-01-02T00:00:00'),
+                ('2', 404, 1, '2024-01-03T00:00:00'),
+                ('99', 10, 1, '2024-01-04T00:00:00')
+        """))
+
+    run_migrations(engine)
+    with engine.connect() as connection:
+        before = connection.execute(select(UserProgress.__table__).order_by("user_id", "video_id")).all()
+    run_migrations(engine)
+
+    inspector = inspect(engine)
+    columns = {column["name"]: column for column in inspector.get_columns("user_progress")}
+    assert isinstance(columns["user_id"]["type"], Integer)
+    assert "course_id" in columns
+    assert {index["name"] for index in inspector.get_indexes("user_progress")} == {
+        index.name for index in UserProgress.__table__.indexes
+    }
+    assert "user_progress_old" not in inspector.get_table_names()
+
+    with engine.connect() as connection:
+        rows = connection.execute(select(UserProgress.__table__).order_by("user_id", "video_id")).all()
+        stats = dict(connection.execute(select(UserStats.user_id, UserStats.completed_count)).all())
+    engine.dispose()
+
+    # Rows of deleted users are dropped; unknown videos keep a NULL course_id
+    assert [tuple(row) for row in rows] == [
+        (1, 10, 5, 1, "2024-01-01T00:00:00"),
+        (1, 11, 5, 0, None),
+        (2, 10, 5, 1, "2024-01-02T00:00:00"),
+        (2, 404, None, 1, "2024-01-03T00:00:00"),
+    ]
+    assert rows == before
+    assert stats == {1: 1, 2: 2}
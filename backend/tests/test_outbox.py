@@ -0,0 +1,77 @@
+"""
+Outbox worker: processed events are deleted, a poison event is retried with
+exponential backoff and dead-lettered after max_attempts without holding up
+the rest of the queue.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from backend import outbox
+from backend.database import AsyncSessionLocal
+from backend.models import OutboxEvent, StripeEvent
+
+MAX_ATTEMPTS = 3
+
+
+@pytest.fixture
+def worker():
+    return outbox.OutboxWorker(batch_size=10, poll_interval=0, max_attempts=MAX_ATTEMPTS,
+                               backoff_base=2, backoff_max=3, lease_seconds=60)
+
+
+def _enqueue(client, event: dict):
+    async def enqueue():
+        async with AsyncSessionLocal() as session:
+            return await outbox.enqueue(session, event["id"], event.get("type", ""), json.dumps(event))
+
+    return client.portal.call(enqueue)
+
+
+def _make_due(db):
+    """Skip past the backoff instead of sleeping through it"""
+    db.execute(update(OutboxEvent).values(available_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+
+
+def test_backoff_doubles_up_to_the_cap(worker):
+    assert [worker.backoff(attempts) for attempts in (1, 2, 3, 4)] == [2, 3, 3, 3]
+    assert outbox.OutboxWorker(10, 0, 8, 2, 600, 60).backoff(4) == 16
+
+
+def test_poison_event_is_retried_then_dead_lettered(client, db, worker):
+    # Missing "data": process_event raises on every attempt
+    assert _enqueue(client, {"id": "evt_poison", "type": "checkout.session.completed"})
+    assert _enqueue(client, {"id": "evt_ok", "type": "customer.created", "data": {"object": {}}})
+    assert not _enqueue(client, {"id": "evt_ok", "type": "customer.created", "data": {"object": {}}})
+
+    assert worker.drain_once() == 2
+    assert db.scalar(select(StripeEvent.id)) == "evt_ok"
+    assert db.scalars(select(OutboxEvent.event_id)).all() == ["evt_poison"]
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        if attempt > 1:
+            # Not claimable again until its backoff has passed
+            assert worker.drain_once() == 0
+            _make_due(db)
+            assert worker.drain_once() == 1
+        db.expire_all()
+        event = db.scalar(select(OutboxEvent))
+        assert event.attempts == attempt
+        assert "data" in event.last_error
+        if attempt < MAX_ATTEMPTS:
+            assert event.status == "pending"
+            delay = (event.available_at - datetime.utcnow()).total_seconds()
+            assert worker.backoff(attempt) - 1 < delay <= worker.backoff(attempt)
+
+    assert event.status == "dead"
+    _make_due(db)
+    assert worker.drain_once() == 0
+    assert outbox.queue_stats(db)["dead"] == 1
+    assert outbox.queue_stats(db)["pending"] == 0
+
+    stats = worker.stats()
+    assert (stats["processed"], stats["retried"], stats["dead_lettered"]) == (1, MAX_ATTEMPTS - 1, 1)
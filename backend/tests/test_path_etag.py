@@ -0,0 +1,155 @@
+"""
+Conditional GETs on the curriculum paths: an unchanged path answers 304,
+completing a video or buying the course invalidates the ETag (including when
+the change is made by another process), and any worker accepts the ETag.
+"""
+
+import time
+from datetime import datetime
+
+from backend import curriculum, entitlements
+from backend.curriculum import path_version_bump
+from backend.models import CoursePurchase, UserProgress
+from backend.stripe_handler import StripeHandler
+
+from .conftest import auth_headers, make_user
+
+
+def _statuses(response):
+    return [node["status"] for node in response.json()]
+
+
+def _revalidate(client, url, headers, etag):
+    return client.get(url, headers={**headers, "If-None-Match": etag})
+
+
+def test_unchanged_path_answers_304(client, db, course_with_videos):
+    course_id, _ = course_with_videos
+    headers = auth_headers(make_user(db, "learner@example.com"))
+    url = f"/courses/{course_id}/path"
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    repeat = _revalidate(client, url, headers, etag)
+    assert repeat.status_code == 304
+    assert repeat.headers["etag"] == etag
+
+
+def test_completion_invalidates_etag(client, db, course_with_videos):
+    course_id, video_ids = course_with_videos
+    headers = auth_headers(make_user(db, "learner@example.com"))
+
+    etags = {url: client.get(url, headers=headers).headers["etag"] for url in (f"/courses/{course_id}/path", "/path")}
+
+    assert client.post("/progress/complete", json={"video_id": video_ids[0]}, headers=headers).status_code == 200
+
+    for url, etag in etags.items():
+        response = _revalidate(client, url, headers, etag)
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert _statuses(response) == ["completed", "active", "locked"]
+
+
+def test_batch_completion_invalidates_etag(client, db, course_with_videos):
+    course_id, video_ids = course_with_videos
+    headers = auth_headers(make_user(db, "learner@example.com"))
+    url = f"/courses/{course_id}/path"
+    etag = client.get(url, headers=headers).headers["etag"]
+
+    response = client.post("/progress/batch", json={"completions": [{"video_id": video_ids[1]}]}, headers=headers)
+    assert response.json()["recorded"] == 1
+
+    response = _revalidate(client, url, headers, etag)
+    assert response.status_code == 200
+    assert _statuses(response) == ["active", "completed", "locked"]
+
+
+def test_purchase_invalidates_etag(client, db, course_with_videos):
+    course_id, _ = course_with_videos
+    user = make_user(db, "buyer@example.com")
+    headers = auth_headers(user)
+    url = f"/courses/{course_id}/path"
+
+    first = client.get(url, headers=headers)
+    assert _statuses(first) == ["active", "locked", "locked"]
+
+    StripeHandler.process_event({
+        "id": "evt_purchase",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "payment_intent": "pi_purchase",
+            "metadata": {"course_id": str(course_id), "user_email": user.email},
+        }},
+    })
+
+    response = _revalidate(client, url, headers, first.headers["etag"])
+    assert response.status_code == 200
+    assert _statuses(response) == ["active", "active", "active"]
+
+
+def test_change_from_another_process_invalidates_etag(client, db, course_with_videos):
+    """Writes made elsewhere only move users.path_version, never this process's counters"""
+    course_id, video_ids = course_with_videos
+    user = make_user(db, "learner@example.com")
+    headers = auth_headers(user)
+    url = f"/courses/{course_id}/path"
+    etag = client.get(url, headers=headers).headers["etag"]
+
+    db.add(UserProgress(user_id=user.id, video_id=video_ids[0], course_id=course_id,
+                        is_completed=1, completed_at=datetime.utcnow().isoformat()))
+    db.execute(path_version_bump([user.id]))
+    db.commit()
+
+    response = _revalidate(client, url, headers, etag)
+    assert response.status_code == 200
+    assert _statuses(response) == ["completed", "active", "locked"]
+    etag = response.headers["etag"]
+
+    # A purchase fulfilled by another process also drops this process's cached entitlements
+    db.add(CoursePurchase(user_id=user.id, course_id=course_id, stripe_payment_id="pi_elsewhere", amount_paid=2.0))
+    db.execute(path_version_bump([user.id]))
+    db.commit()
+
+    response = _revalidate(client, url, headers, etag)
+    assert response.status_code == 200
+    assert _statuses(response) == ["completed", "active", "active"]
+    assert _revalidate(client, url, headers, response.headers["etag"]).status_code == 304
+
+
+def test_independently_built_layouts_share_an_etag(client, db, course_with_videos, monkeypatch):
+    """Another worker, or a rebuild after LAYOUT_TTL_SECONDS, must accept the same ETag"""
+    course_id, video_ids = course_with_videos
+    rows = [(video_id, f"Lesson {i}", f"https://www.youtube.com/watch?v=lesson{i}", course_id)
+            for i, video_id in enumerate(video_ids, 1)]
+    first = curriculum.build_layout(rows, version=1)
+    time.sleep(0.01)
+    second = curriculum.build_layout(list(rows), version=7)
+    assert first.built_at != second.built_at
+    assert first.digest == second.digest
+    assert curriculum.build_layout(rows[:2], version=1).digest != first.digest
+
+    headers = auth_headers(make_user(db, "learner@example.com"))
+    for url in (f"/courses/{course_id}/path", "/path", "/courses"):
+        etag = client.get(url, headers=headers).headers["etag"]
+
+        # Fresh process state: no cached layouts/catalog, entitlements or observed versions
+        curriculum._layouts.clear()
+        curriculum.content_version.bump()
+        entitlements.entitlement_cache.clear()
+        monkeypatch.setattr(curriculum, "progress_versions", curriculum.ProgressVersions())
+
+        assert _revalidate(client, url, headers, etag).status_code == 304
+
+
+def test_unknown_courses_are_not_cached(client, db, course_with_videos):
+    course_id, _ = course_with_videos
+    headers = auth_headers(make_user(db, "learner@example.com"))
+
+    for unknown in range(1000, 1050):
+        assert client.get(f"/courses/{unknown}/path", headers=headers).status_code == 404
+    client.get(f"/courses/{course_id}/path", headers=headers)
+
+    assert curriculum._layouts.stats()["size"] == 1
+    assert curriculum._layouts.maxsize == curriculum.LAYOUT_CACHE_MAX_SIZE
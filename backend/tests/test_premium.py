@@ -0,0 +1,87 @@
+"""
+Premium expiry: the sweeper revokes lapsed premium in one UPDATE, moves
+users.path_version and drops the cached snapshots; the premium_expires_at
+migration rewrites legacy strings to naive UTC and revokes unreadable ones.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, text
+
+from backend import auth, entitlements
+from backend.migrations import run_migrations
+from backend.models import Base, User
+from backend.premium import PremiumSweeper
+
+from .conftest import auth_headers, make_user
+
+
+def _statuses(response):
+    return [node["status"] for node in response.json()]
+
+
+def test_sweep_revokes_lapsed_premium(client, db, course_with_videos):
+    course_id, _ = course_with_videos
+    now = datetime(2030, 1, 1)
+    lapsed = make_user(db, "lapsed@example.com", is_premium=1, premium_expires_at=now - timedelta(seconds=1))
+    current = make_user(db, "current@example.com", is_premium=1, premium_expires_at=now + timedelta(days=1))
+    lifetime = make_user(db, "lifetime@example.com", is_premium=1)
+    headers = auth_headers(lapsed)
+    url = f"/courses/{course_id}/path"
+
+    first = client.get(url, headers=headers)
+    assert _statuses(first) == ["active", "active", "active"]
+    assert auth.user_cache.get(lapsed.id) is not None
+    assert entitlements.entitlement_cache.get(lapsed.id) is not None
+
+    sweeper = PremiumSweeper(interval=0)
+    assert sweeper.sweep_once(now) == [lapsed.id]
+    assert sweeper.sweep_once(now) == []
+    assert sweeper.stats()["rows_affected"] == 1
+
+    assert auth.user_cache.get(lapsed.id) is None
+    assert entitlements.entitlement_cache.get(lapsed.id) is None
+    rows = dict(db.execute(select(User.id, User.is_premium)).all())
+    assert rows == {lapsed.id: 0, current.id: 1, lifetime.id: 1}
+    assert db.scalar(select(User.path_version).where(User.id == lapsed.id)) == 1
+    assert db.scalar(select(User.path_version).where(User.id == current.id)) == 0
+
+    response = client.get(url, headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert response.status_code == 200
+    assert _statuses(response) == ["active", "locked", "locked"]
+
+
+def test_premium_expires_at_migration(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    values = {
+        "canonical@example.com": "2030-01-01 00:00:00",
+        "offset@example.com": "2030-01-01T01:00:00+01:00",
+        "zulu@example.com": "2030-01-01T00:00:00Z",
+        "garbage@example.com": "next tuesday",
+        "lifetime@example.com": None,
+    }
+    with engine.begin() as connection:
+        for email, expires_at in values.items():
+            connection.execute(
+                text("INSERT INTO users (email, hashed_password, is_admin, is_premium, premium_expires_at) "
+                     "VALUES (:email, 'x', 0, 1, :expires_at)"),
+                {"email": email, "expires_at": expires_at},
+            )
+
+    run_migrations(engine)
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        rows = {row.email: (row.is_premium, row.premium_expires_at)
+                for row in connection.execute(select(User.email, User.is_premium, User.premium_expires_at))}
+    engine.dispose()
+
+    expected = datetime(2030, 1, 1)
+    assert rows == {
+        "canonical@example.com": (1, expected),
+        "offset@example.com": (1, expected),
+        "zulu@example.com": (1, expected),
+        "garbage@example.com": (0, datetime(1970, 1, 1)),
+        "lifetime@example.com": (1, None),
+    }
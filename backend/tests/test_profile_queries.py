@@ -0,0 +1,57 @@
+"""
+/profile must stay a fixed, small number of statements however much progress
+a user has (cached totals, user_stats counter, one join for recent items).
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend.database import async_engine
+from backend.models import Video
+
+from .conftest import auth_headers, make_user
+
+# user_stats.completed_count + the recent-completions join (user and video total are cached)
+WARM_PROFILE_STATEMENTS = 2
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+def test_profile_query_count_is_constant(client, db, course_with_videos):
+    course_id, _ = course_with_videos
+    user = make_user(db, "learner@example.com")
+    headers = auth_headers(user)
+
+    # Plenty of history, so a per-row query would show up in the count
+    extra = [Video(title=f"Extra {i}", url=f"https://www.youtube.com/watch?v=extra{i}", course_id=course_id)
+             for i in range(50)]
+    db.add_all(extra)
+    db.commit()
+    started = datetime(2024, 1, 1)
+    completions = [{"video_id": video.id, "completed_at": (started + timedelta(minutes=i)).isoformat()}
+                   for i, video in enumerate(extra)]
+    assert client.post("/progress/batch", json={"completions": completions}, headers=headers).json()["recorded"] == 50
+
+    client.get("/profile", headers=headers)  # Warm the user snapshot and the video total
+    with count_statements() as statements:
+        response = client.get("/profile", headers=headers)
+
+    assert response.status_code == 200
+    stats = response.json()["stats"]
+    assert stats["completed_videos"] == 50
+    assert [item["title"] for item in stats["recent_completions"]] == [f"Extra {i}" for i in range(49, 44, -1)]
+    assert len(statements) == WARM_PROFILE_STATEMENTS, statements
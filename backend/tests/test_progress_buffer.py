@@ -0,0 +1,139 @@
+"""
+Write-behind progress buffer: reads overlay buffered completions, and a
+size-triggered flush runs to completion without waiting for the timer.
+"""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import select
+
+from backend import progress
+from backend.models import UserProgress, UserStats
+
+from .conftest import auth_headers, make_user
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    # Long interval so only the size threshold can trigger a flush
+    buffer = progress.ProgressBuffer(enabled=True, flush_interval=3600, max_rows=2)
+    monkeypatch.setattr(progress, "progress_buffer", buffer)
+    return buffer
+
+
+def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_buffered_completion_is_visible_before_flush(client, db, course_with_videos, write_behind):
+    course_id, video_ids = course_with_videos
+    headers = auth_headers(make_user(db, "learner@example.com"))
+
+    client.post("/progress/complete", json={"video_id": video_ids[0]}, headers=headers)
+
+    assert write_behind.depth == 1
+    assert db.scalar(select(UserProgress.video_id)) is None
+    statuses = [node["status"] for node in client.get(f"/courses/{course_id}/path", headers=headers).json()]
+    assert statuses == ["completed", "active", "locked"]
+
+
+def test_size_threshold_flushes_in_background(client, db, course_with_videos, write_behind):
+    _, video_ids = course_with_videos
+    user = make_user(db, "learner@example.com")
+    headers = auth_headers(user)
+
+    response = client.post("/progress/batch", json={"completions": [{"video_id": v} for v in video_ids[:2]]}, headers=headers)
+    assert response.json()["recorded"] == 2
+
+    _wait_for(lambda: write_behind.stats()["rows_flushed"] == 2)
+    _wait_for(lambda: not write_behind._flush_tasks)
+    assert write_behind.depth == 0
+    db.expire_all()
+    assert set(db.scalars(select(UserProgress.video_id).where(UserProgress.user_id == user.id))) == set(video_ids[:2])
+    assert db.scalar(select(UserStats.completed_count).where(UserStats.user_id == user.id)) == 2
+
+
+@pytest.fixture
+def slow_upserts(monkeypatch):
+    """Hold every flush inside upsert_rows long enough to stop/cancel it mid-write"""
+    upsert_rows = progress.upsert_rows
+    started = []
+
+    async def slow(db, rows):
+        started.append(len(rows))
+        await asyncio.sleep(0.2)
+        await upsert_rows(db, rows)
+
+    monkeypatch.setattr(progress, "upsert_rows", slow)
+    return started
+
+
+def test_stop_during_timer_flush_keeps_rows(client, db, course_with_videos, slow_upserts):
+    _, video_ids = course_with_videos
+    user = make_user(db, "learner@example.com")
+    buffer = progress.ProgressBuffer(enabled=True, flush_interval=0.01, max_rows=1000)
+
+    async def scenario():
+        buffer.start()
+        buffer.add(user.id, video_ids[0], None, "2024-01-01T00:00:00")
+        while not slow_upserts:
+            await asyncio.sleep(0.005)
+        await buffer.stop()
+
+    client.portal.call(scenario)
+
+    assert buffer.depth == 0
+    assert db.scalar(select(UserProgress.video_id).where(UserProgress.user_id == user.id)) == video_ids[0]
+
+
+def test_cancelled_flush_requeues_rows(client, db, course_with_videos, slow_upserts):
+    _, video_ids = course_with_videos
+    user = make_user(db, "learner@example.com")
+    buffer = progress.ProgressBuffer(enabled=True, flush_interval=3600, max_rows=1000)
+
+    async def scenario():
+        buffer.add(user.id, video_ids[0], None, "2024-01-01T00:00:00")
+        flush = asyncio.get_running_loop().create_task(buffer.flush())
+        while not slow_upserts:
+            await asyncio.sleep(0.005)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+
+    client.portal.call(scenario)
+
+    assert buffer.depth == 1
+    assert buffer.completed_video_ids(user.id) == {video_ids[0]}
+    assert db.scalar(select(UserProgress.video_id)) is None
+
+
+def test_only_new_completions_are_counted(client, db, course_with_videos):
+    """Fresh rows and incomplete rows count once; repeats and completed rows never do"""
+    course_id, video_ids = course_with_videos
+    user = make_user(db, "learner@example.com")
+    db.add_all([
+        UserProgress(user_id=user.id, video_id=video_ids[0], course_id=course_id, is_completed=0),
+        UserProgress(user_id=user.id, video_id=video_ids[1], course_id=course_id, is_completed=1,
+                     completed_at="2024-01-01T00:00:00"),
+    ])
+    db.commit()
+
+    async def upsert(completed_at):
+        async with progress.AsyncSessionLocal() as session:
+            await progress.upsert_rows(session, [
+                progress.completion_row(user.id, video_id, course_id, completed_at) for video_id in video_ids
+            ])
+            await session.commit()
+
+    client.portal.call(upsert, "2024-02-01T00:00:00")
+    client.portal.call(upsert, "2024-03-01T00:00:00")
+
+    db.expire_all()
+    assert db.scalar(select(UserStats.completed_count).where(UserStats.user_id == user.id)) == 2
+    rows = db.execute(select(UserProgress.is_completed, UserProgress.completed_at).where(UserProgress.user_id == user.id))
+    assert set(rows) == {(1, "2024-03-01T00:00:00")}
@@ -0,0 +1,130 @@
+"""
+Scraper pipeline against a fake yt-dlp: levels are written in curriculum
+order whatever order their searches finish in, each level keeps at most
+VIDEOS_PER_LEVEL videos in search-rank order, and detail fetches stop once
+a level's quota is filled.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from backend.ingestion import scraper
+from backend.ingestion.metadata_cache import MetadataCache
+from backend.models import Course, Video
+
+LEVELS = 3
+RECENT = datetime.now().strftime("%Y%m%d")
+
+
+def _entries(level: int) -> list:
+    """Ranked search results: two pre-filtered, one rejected on details, four good"""
+    return [
+        {"id": f"l{level}good0", "title": f"Level {level} good 0", "duration": 300},
+        {"id": f"l{level}funny", "title": f"Level {level} funny moments", "duration": 300},
+        {"id": f"l{level}short", "title": f"Level {level} short", "duration": 30},
+        {"id": f"l{level}old", "title": f"Level {level} old", "duration": 300},
+        {"id": f"l{level}good1", "title": f"Level {level} good 1", "duration": 300},
+        {"id": f"l{level}good2", "title": f"Level {level} good 2", "duration": 300},
+        {"id": f"l{level}good3", "title": f"Level {level} good 3", "duration": 300},
+    ]
+
+
+class FakeYoutubeDL:
+    searches = []
+    details = []
+    lock = threading.Lock()
+
+    def __init__(self, options):
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=False):
+        if url.startswith("ytsearch"):
+            level = int(url.rsplit("level", 1)[-1])
+            with self.lock:
+                self.searches.append(level)
+            # Later levels answer first
+            time.sleep(0.02 * (LEVELS - level))
+            return {"entries": _entries(level)}
+
+        video_id = url.rsplit("v=", 1)[-1]
+        with self.lock:
+            self.details.append(video_id)
+        # The top-ranked result is the slowest to fetch
+        time.sleep(0.03 if video_id.endswith("good0") else 0.005)
+        return {
+            "id": video_id,
+            "title": f"Details {video_id}",
+            "description": "How to do it properly",
+            "duration": 300,
+            "upload_date": "20000101" if video_id.endswith("old") else RECENT,
+            "view_count": 1000,
+            "like_count": 50,
+            "height": 1080,
+        }
+
+    def sanitize_info(self, info):
+        return info
+
+
+@pytest.fixture
+def life_skills_scraper(db, tmp_path, monkeypatch):
+    FakeYoutubeDL.searches, FakeYoutubeDL.details = [], []
+    monkeypatch.setattr(scraper.yt_dlp, "YoutubeDL", FakeYoutubeDL)
+    course = Course(title="Test course", description="", difficulty="beginner", video_count=0)
+    db.add(course)
+    db.commit()
+    monkeypatch.setitem(scraper.COURSE_ID_MAP, "test_course", course.id)
+
+    instance = scraper.LifeSkillsScraper(cache=MetadataCache(path=str(tmp_path / "cache.db")))
+    instance.rate_limiter = scraper.HostRateLimiter(0)
+    yield instance, course.id
+    instance.executor.shutdown(wait=True)
+    instance.db.close()
+
+
+def test_levels_written_in_order_with_per_level_quota(db, life_skills_scraper):
+    instance, course_id = life_skills_scraper
+    course_data = {
+        "title": "Test course",
+        "levels": [
+            {"level": level, "topic": f"Topic {level}", "search_query": f"query level{level}"}
+            for level in range(1, LEVELS + 1)
+        ],
+    }
+
+    instance.scrape_course("test_course", course_data)
+
+    videos = db.execute(
+        select(Video.level_index, Video.url, Video.order_index, Video.cluster_name)
+        .where(Video.course_id == course_id)
+        .order_by(Video.order_index)
+    ).all()
+    quota = instance.VIDEOS_PER_LEVEL
+    assert [video.level_index for video in videos] == [level for level in range(1, LEVELS + 1) for _ in range(quota)]
+    assert [video.order_index for video in videos] == list(range(1, LEVELS * quota + 1))
+    for level in range(1, LEVELS + 1):
+        urls = [video.url.rsplit("v=", 1)[-1] for video in videos if video.level_index == level]
+        # Search-rank order, skipping the filtered entries
+        assert urls == [f"l{level}good0", f"l{level}good1", f"l{level}good2"]
+        assert {video.cluster_name for video in videos if video.level_index == level} == {f"Topic {level}"}
+
+    assert sorted(FakeYoutubeDL.searches) == list(range(1, LEVELS + 1))
+    # Flat-filtered entries and the candidates left after the quota is met are never fetched
+    for level in range(1, LEVELS + 1):
+        fetched = {video_id for video_id in FakeYoutubeDL.details if video_id.startswith(f"l{level}")}
+        assert f"l{level}funny" not in fetched and f"l{level}short" not in fetched
+        assert f"l{level}good3" not in fetched
+    assert instance.stats["added"] == LEVELS * quota
+    assert instance.stats["details_avoided"] == LEVELS * 3
+    db.expire_all()
+    assert db.get(Course, course_id).video_count == LEVELS * quota
@@ -0,0 +1,108 @@
+"""
+Catalog provisioning against the local Stripe stub: only missing products and
+prices are created, a re-run is a no-op, and the app loads the price map.
+"""
+
+import json
+
+import pytest
+
+from backend import create_stripe_products
+from backend.stripe_handler import StripeHandler
+
+
+@pytest.fixture
+def provisioning_paths(tmp_path, monkeypatch):
+    snapshot_path = tmp_path / "snapshot.json"
+    price_map_path = tmp_path / "prices.json"
+    monkeypatch.setattr(create_stripe_products, "SNAPSHOT_PATH", str(snapshot_path))
+    monkeypatch.setattr(create_stripe_products, "PRICE_MAP_PATH", str(price_map_path))
+    return snapshot_path, price_map_path
+
+
+@pytest.fixture
+def restore_prices(monkeypatch):
+    for name in ("PRICE_MAP", "PRICE_ONE_TIME", "PRICE_MONTHLY"):
+        monkeypatch.setattr(StripeHandler, name, getattr(StripeHandler, name))
+
+
+def _creates(stub) -> int:
+    return stub.calls("POST", "/v1/products") + stub.calls("POST", "/v1/prices")
+
+
+def test_first_run_creates_catalog_and_rerun_is_noop(stripe_stub, provisioning_paths):
+    snapshot_path, price_map_path = provisioning_paths
+    catalog = create_stripe_products.local_catalog()
+
+    price_map = create_stripe_products.create_products()
+    assert set(price_map) == {item["catalog_key"] for item in catalog}
+    assert stripe_stub.calls("POST", "/v1/products") == len(catalog)
+    assert stripe_stub.calls("POST", "/v1/prices") == len(catalog)
+    assert json.loads(price_map_path.read_text()) == price_map
+
+    monthly = stripe_stub.prices[price_map["premium_monthly"]]
+    assert monthly["recurring"] == {"interval": "month"}
+    assert monthly["unit_amount"] == 999
+
+    # Cached snapshot: nothing fetched, nothing created
+    requests_before = len(stripe_stub.requests)
+    assert create_stripe_products.create_products() == price_map
+    assert len(stripe_stub.requests) == requests_before
+
+    # Fresh snapshot from the account: one paged listing each, still nothing created
+    assert create_stripe_products.create_products(refresh=True) == price_map
+    assert stripe_stub.calls("GET", "/v1/products") == 2  # First run (no snapshot yet) + refresh
+    assert stripe_stub.calls("GET", "/v1/prices") == 2
+    assert _creates(stripe_stub) == 2 * len(catalog)
+
+
+def test_only_missing_items_are_created(stripe_stub, provisioning_paths):
+    # Account already holds most of the catalog: course_1 has a product but no
+    # price, premium_monthly has neither
+    existing = {}
+    for item in create_stripe_products.local_catalog():
+        if item["catalog_key"] == "premium_monthly":
+            continue
+        product = stripe_stub.create_product({"name": item["name"], "metadata": {"catalog_key": item["catalog_key"]}})
+        if item["catalog_key"] == "course_1":
+            continue
+        price = stripe_stub.create_price({
+            "product": product["id"], "unit_amount": item["unit_amount"], "currency": item["currency"],
+            "recurring": {"interval": item["interval"]} if item["interval"] else None,
+        })
+        existing[item["catalog_key"]] = price["id"]
+
+    price_map = create_stripe_products.create_products(refresh=True)
+
+    assert stripe_stub.calls("POST", "/v1/products") == 1  # premium_monthly
+    assert stripe_stub.calls("POST", "/v1/prices") == 2  # premium_monthly, course_1
+    assert {key: price_map[key] for key in existing} == existing
+    assert stripe_stub.prices[price_map["course_1"]]["lookup_key"] == "course_1"
+    assert stripe_stub.prices[price_map["premium_monthly"]]["recurring"] == {"interval": "month"}
+
+
+def test_dry_run_creates_nothing(stripe_stub, provisioning_paths):
+    snapshot_path, price_map_path = provisioning_paths
+    assert create_stripe_products.create_products(refresh=True, dry_run=True) == {}
+    assert _creates(stripe_stub) == 0
+    assert not price_map_path.exists()
+
+
+def test_app_loads_price_map(stripe_stub, provisioning_paths, restore_prices):
+    _, price_map_path = provisioning_paths
+    price_map = create_stripe_products.create_products()
+
+    StripeHandler.load_price_map(str(price_map_path))
+
+    assert StripeHandler.PRICE_ONE_TIME == price_map["premium_lifetime"]
+    assert StripeHandler.PRICE_MONTHLY == price_map["premium_monthly"]
+    assert StripeHandler._course_line_item(1, "Adulting 101") == {"price": price_map["course_1"], "quantity": 1}
+
+
+def test_missing_price_map_keeps_defaults(tmp_path, restore_prices):
+    one_time, monthly = StripeHandler.PRICE_ONE_TIME, StripeHandler.PRICE_MONTHLY
+
+    StripeHandler.load_price_map(str(tmp_path / "missing.json"))
+
+    assert (StripeHandler.PRICE_ONE_TIME, StripeHandler.PRICE_MONTHLY) == (one_time, monthly)
+    assert "price_data" in StripeHandler._course_line_item(999, "Unprovisioned")
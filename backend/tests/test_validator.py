@@ -0,0 +1,79 @@
+"""
+VideoValidator.validate_batch agrees with validate() row by row: accept/reject,
+which check rejects first, and beginner classification.
+"""
+
+from itertools import product
+
+from backend.ingestion.validator import RejectReason, VideoMetadata, VideoValidator
+from backend.models import DifficultyLevel
+
+HEIGHTS = [0, 719, 720, 1080]
+DURATIONS = [0, 59, 60, 10800, 10801]
+VIEWS = [0, 1000]
+LIKES = [0, 5]
+TITLES = ["Stitching 101", "Funny stitching", "Intro to pranks... prank", "Stitching masterclass"]
+DESCRIPTIONS = ["", "A stream highlight"]
+TAGS = [[], ["comedy"], ["beginner", "sewing"]]
+
+
+def _scalar_reason(validator: VideoValidator, video: VideoMetadata) -> RejectReason:
+    """Which check validate() stops at, using the same helpers in the same order"""
+    if not validator._check_resolution(video):
+        return RejectReason.LOW_RESOLUTION
+    if not validator._check_duration(video):
+        return RejectReason.INVALID_DURATION
+    if not validator._check_engagement(video):
+        return RejectReason.LOW_ENGAGEMENT
+    if not validator._check_relevance(video):
+        return RejectReason.NEGATIVE_KEYWORD
+    return RejectReason.OK
+
+
+def test_batch_agrees_with_validate(capsys):
+    validator = VideoValidator()
+    videos = [
+        VideoMetadata(url=f"https://youtube.com/watch?v={i}", title=title, duration_seconds=duration,
+                      description=description, tags=tags, view_count=views, like_count=likes,
+                      resolution_height=height)
+        for i, (height, duration, views, likes, title, description, tags)
+        in enumerate(product(HEIGHTS, DURATIONS, VIEWS, LIKES, TITLES, DESCRIPTIONS, TAGS))
+    ]
+
+    result = validator.validate_batch(
+        resolution_height=[v.resolution_height for v in videos],
+        duration_seconds=[v.duration_seconds for v in videos],
+        view_count=[v.view_count for v in videos],
+        like_count=[v.like_count for v in videos],
+        titles=[v.title for v in videos],
+        descriptions=[v.description for v in videos],
+        tags=[v.tags for v in videos],
+    )
+
+    for i, video in enumerate(videos):
+        reason = _scalar_reason(validator, video)
+        accepted = validator.validate(video)
+        assert (accepted is not None) == bool(result.accepted[i]), video
+        assert RejectReason(result.reasons[i]) == reason, video
+        assert result.difficulty(i) == (accepted.difficulty if accepted else None), video
+
+    counts = result.reason_counts()
+    assert sum(counts.values()) == len(videos)
+    assert all(counts[reason.name] for reason in RejectReason)
+    assert result.difficulty(0) is None
+    capsys.readouterr()
+
+
+def test_batch_rejects_missing_numbers():
+    result = VideoValidator().validate_batch(
+        resolution_height=[None, 1080, 1080, 1080],
+        duration_seconds=[600, None, 600, 600],
+        view_count=[1000, 1000, None, 1000],
+        like_count=[10, 10, 10, None],
+        titles=["Basics", "Basics", "Basics", None],
+    )
+
+    assert [RejectReason(r) for r in result.reasons] == [
+        RejectReason.LOW_RESOLUTION, RejectReason.INVALID_DURATION, RejectReason.LOW_ENGAGEMENT, RejectReason.OK,
+    ]
+    assert result.difficulty(3) == DifficultyLevel.INTERMEDIATE
@@ -0,0 +1,109 @@
+"""
+Webhook fulfilment is idempotent: duplicated, out-of-order deliveries signed
+with the local webhook secret produce exactly one purchase per user/course.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+
+from sqlalchemy import func, select
+
+from backend.models import Course, CoursePurchase, OutboxEvent, StripeEvent
+from backend.outbox import outbox_worker
+from backend.stripe_handler import StripeHandler
+
+from .conftest import make_user
+
+USERS = 20
+COURSES = 5
+EVENTS_PER_PURCHASE = 5  # e.g. Stripe resending the same checkout under new event ids
+DELIVERIES = 10_000
+# Over HTTP each delivery is a request plus a commit, so replay a smaller shuffle there
+HTTP_DELIVERIES = 2_000
+
+
+def sign(payload: bytes) -> str:
+    """Stripe-Signature header for `payload`, as Stripe computes it"""
+    timestamp = int(time.time())
+    secret = os.environ["STRIPE_WEBHOOK_SECRET"]
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def purchase_event(event_id: str, email: str, course_id: int) -> dict:
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "object": "checkout.session",
+            "payment_intent": f"pi_{event_id}",
+            "metadata": {"course_id": str(course_id), "user_email": email},
+        }},
+    }
+
+
+def _fixture_events(db) -> list:
+    courses = [Course(title=f"Course {i}", description="", difficulty="beginner", video_count=0) for i in range(COURSES)]
+    db.add_all(courses)
+    db.commit()
+    users = [make_user(db, f"buyer{i}@example.com") for i in range(USERS)]
+    return [
+        purchase_event(f"evt_{user.id}_{course.id}_{n}", user.email, course.id)
+        for user in users for course in courses for n in range(EVENTS_PER_PURCHASE)
+    ]
+
+
+def _deliveries(events: list, count: int = DELIVERIES) -> list:
+    deliveries = [events[i % len(events)] for i in range(count)]
+    random.Random(42).shuffle(deliveries)
+    return deliveries
+
+
+def _assert_one_purchase_per_pair(db, events):
+    assert db.scalar(select(func.count()).select_from(CoursePurchase)) == USERS * COURSES
+    assert db.scalar(
+        select(func.count()).select_from(
+            select(CoursePurchase.user_id, CoursePurchase.course_id)
+            .group_by(CoursePurchase.user_id, CoursePurchase.course_id).subquery()
+        )
+    ) == USERS * COURSES
+    assert db.scalar(select(func.count()).select_from(StripeEvent)) == len(events)
+
+
+def test_process_event_replay_is_idempotent(db):
+    events = _fixture_events(db)
+    applied = [StripeHandler.process_event(event) for event in _deliveries(events)]
+
+    assert sum(result is not None for result in applied) == len(events)
+    assert sum(bool(result and result["created"]) for result in applied) == USERS * COURSES
+    _assert_one_purchase_per_pair(db, events)
+
+
+def test_signed_webhook_replay_is_idempotent(client, db):
+    events = _fixture_events(db)
+    payloads = {event["id"]: json.dumps(event).encode() for event in events}
+
+    statuses = []
+    for event in _deliveries(events, HTTP_DELIVERIES):
+        payload = payloads[event["id"]]
+        response = client.post("/payment/webhook", content=payload, headers={"stripe-signature": sign(payload)})
+        assert response.status_code == 200
+        statuses.append(response.json()["status"])
+    assert statuses.count("queued") == len(events)
+
+    while outbox_worker.drain_once():
+        pass
+
+    assert db.scalar(select(func.count()).select_from(OutboxEvent)) == 0
+    _assert_one_purchase_per_pair(db, events)
+
+
+def test_bad_signature_is_rejected(client):
+    payload = json.dumps(purchase_event("evt_forged", "nobody@example.com", 1)).encode()
+    response = client.post("/payment/webhook", content=payload, headers={"stripe-signature": "t=1,v1=forged"})
+    assert response.status_code == 400